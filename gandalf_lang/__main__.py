@@ -1,9 +1,15 @@
+import os
 import sys
 
+from . import cache
 from .repl import repl
 from .runtime import run_file
 from .tokens import GandalfError
 
+def _report_cache() -> None:
+    if os.environ.get("GANDALF_CACHE_STATS"):
+        print(f"cache: {cache.stats['hits']} hit(s), {cache.stats['misses']} miss(es)", file=sys.stderr)
+
 def main(argv: list[str]) -> int:
     # Script mode
     if len(argv) >= 2:
@@ -18,6 +24,8 @@ def main(argv: list[str]) -> int:
             # Unexpected internal error
             print(f"Fizzle (unexpected): {e}")
             return 2
+        finally:
+            _report_cache()
 
     # REPL mode
     repl()
@@ -1,6 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from typing import Any, List, Optional, Tuple
+
+# Every node declares __slots__ (the bases too, or subclasses would still get
+# a __dict__): nodes are built by the thousand while parsing, and slotted
+# instances are smaller and quicker to create.
 
 # =========================
 # Expressions
@@ -8,59 +12,86 @@ from typing import List, Optional, Tuple
 
 @dataclass(frozen=True)
 class Expr:
-    pass
+    __slots__ = ()
 
 @dataclass(frozen=True)
 class Num(Expr):
+    __slots__ = ("value",)
     value: float | int
 
 @dataclass(frozen=True)
 class Str(Expr):
+    __slots__ = ("value",)
     value: str
 
 @dataclass(frozen=True)
 class BoolLit(Expr):
+    __slots__ = ("value",)
     value: bool
 
 @dataclass(frozen=True)
 class NilLit(Expr):
-    pass
+    __slots__ = ()
 
 @dataclass(frozen=True)
 class Var(Expr):
+    __slots__ = ("name",)
     name: str
 
 @dataclass(frozen=True)
 class UnaryOp(Expr):
+    __slots__ = ("op", "expr")
     op: str  # "NEG"
     expr: Expr
 
 @dataclass(frozen=True)
 class BinOp(Expr):
+    __slots__ = ("left", "op", "right")
     left: Expr
     op: str
     right: Expr
 
+@dataclass(frozen=True)
+class ChainOp(Expr):
+    # a run of one left-associative operator, a op b op c ...; evaluates like
+    # the left-leaning BinOp tree it replaces, without the depth
+    __slots__ = ("op", "operands")
+    op: str
+    operands: List[Expr]
+
 @dataclass(frozen=True)
 class Call(Expr):
+    __slots__ = ("name", "args")
     name: str
     args: List[Expr]
 
 @dataclass(frozen=True)
 class Invoke(Expr):
+    __slots__ = ("target", "args")
     target: str
     args: List[Expr]
 
+@dataclass(frozen=True)
+class FoldedInvoke(Expr):
+    # an invoke whose result was computed by constant folding; the lore rules
+    # that can forbid invoke are still checked when it is evaluated
+    __slots__ = ("target", "value")
+    target: str
+    value: Any
+
 @dataclass(frozen=True)
 class ListLit(Expr):
+    __slots__ = ("items",)
     items: List[Expr]
 
 @dataclass(frozen=True)
 class DictLit(Expr):
+    __slots__ = ("items",)
     items: List[Tuple[Expr, Expr]]  # (key, value)
 
 @dataclass(frozen=True)
 class Index(Expr):
+    __slots__ = ("target", "index")
     target: Expr
     index: Expr
 
@@ -70,52 +101,62 @@ class Index(Expr):
 
 @dataclass(frozen=True)
 class Stmt:
-    pass
+    __slots__ = ()
 
 @dataclass(frozen=True)
 class Inscribe(Stmt):
+    __slots__ = ("name", "expr")
     name: str
     expr: Expr
 
 @dataclass(frozen=True)
 class Proclaim(Stmt):
+    __slots__ = ("expr",)
     expr: Expr
 
 @dataclass(frozen=True)
 class ExprStmt(Stmt):
+    __slots__ = ("expr",)
     expr: Expr
 
 @dataclass(frozen=True)
 class IfStmt(Stmt):
+    __slots__ = ("cond", "then_body", "else_body")
     cond: Expr
     then_body: List[Stmt]
     else_body: List[Stmt]
 
 @dataclass(frozen=True)
 class WhileStmt(Stmt):
+    __slots__ = ("cond", "body")
     cond: Expr
     body: List[Stmt]
 
 @dataclass(frozen=True)
 class SpellDef(Stmt):
+    __slots__ = ("name", "params", "body")
     name: str
     params: List[str]
     body: List[Stmt]
 
 @dataclass(frozen=True)
 class ReturnStmt(Stmt):
+    __slots__ = ("expr",)
     expr: Optional[Expr]
 
 @dataclass(frozen=True)
 class InRegion(Stmt):
+    __slots__ = ("region", "body")
     region: str
     body: List[Stmt]
 
 @dataclass(frozen=True)
 class BeRace(Stmt):
+    __slots__ = ("race",)
     race: str
 
 @dataclass(frozen=True)
 class ArtifactAction(Stmt):
+    __slots__ = ("action", "artifact")
     action: str
     artifact: str
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from typing import Dict
+
+from .compiler import BYTECODE_VERSION, Code, compile_source
+
+# -------------------------
+# Compiled program cache
+# -------------------------
+# Scripts are compiled once per distinct source text and the resulting Code is
+# pickled under ~/.gandalf_cache (or $GANDALF_CACHE_DIR). Set GANDALF_CACHE=0
+# to always compile from scratch.
+
+stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+def cache_enabled() -> bool:
+    return os.environ.get("GANDALF_CACHE", "1") != "0"
+
+def cache_dir() -> str:
+    return os.environ.get("GANDALF_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".gandalf_cache")
+
+def cache_key(src: str) -> str:
+    h = hashlib.sha256(src.encode("utf-8", "surrogatepass"))
+    h.update(f"|py{sys.version_info[0]}.{sys.version_info[1]}|bc{BYTECODE_VERSION}".encode("ascii"))
+    return h.hexdigest()
+
+def _load(path: str) -> Code | None:
+    try:
+        with open(path, "rb") as f:
+            co = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # unreadable or corrupt entry: recompile and overwrite it
+        return None
+    return co if isinstance(co, Code) else None
+
+def _store(path: str, co: Code) -> None:
+    folder = os.path.dirname(path)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(co, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except (OSError, pickle.PicklingError):
+        # the cache is an optimization only; never fail a run over it
+        pass
+
+def load_or_compile(src: str) -> Code:
+    if not cache_enabled():
+        return compile_source(src)
+
+    path = os.path.join(cache_dir(), cache_key(src) + ".pkl")
+    co = _load(path)
+    if co is not None:
+        stats["hits"] += 1
+        return co
+
+    stats["misses"] += 1
+    co = compile_source(src)
+    _store(path, co)
+    return co
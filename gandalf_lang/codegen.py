@@ -0,0 +1,516 @@
+from __future__ import annotations
+import math
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from .tokens import RuntimeError
+from .library import SAFE_INVOKE
+from .folding import is_quiet, is_str_expr
+from .ast_nodes import (
+    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, ChainOp, Call, Invoke,
+    FoldedInvoke, ListLit, DictLit, Index,
+    Stmt, Inscribe, Proclaim, ExprStmt, IfStmt, WhileStmt, SpellDef, ReturnStmt,
+    BeRace, ArtifactAction, InRegion
+)
+
+# A spell body is also emitted as Python source, which the runtime execs once
+# per definition and calls instead of running the bytecode, so each operation
+# is a handful of CPython instructions rather than a trip around the VM loop.
+#
+# Parameters become the Python locals a0, a1, ... (by slot); every other name
+# is a string key into the interpreter's globals dict. Operators keep the VM's
+# semantics: a numeric fast path is inlined and everything else (including the
+# error messages) goes through the slow-path helpers below.
+#
+# A spell whose parameters provably stay numbers once they start as numbers
+# (see _numeric_params) gets its body twice: a numeric version, in which
+# arithmetic on those parameters and literals drops the type checks, runs
+# when the arguments are numbers, and the checked version otherwise.
+#
+# An `in ... do` block pushes and pops the region around its body; a `return`
+# inside one pops what it opened, and an error leaves the unwinding to the VM
+# frame the error escapes through, as with bytecode. Nested spell definitions
+# are left to the VM, which owns spell registration; a spell that has one gets
+# no Python source and simply runs as bytecode.
+
+class _Unsupported(Exception):
+    pass
+
+# -------------------------
+# Slow paths (shared by every generated spell)
+# -------------------------
+# a frozenset: the generated guards test `type(x) in _NUM`, and a hashed
+# lookup is quicker than scanning a tuple when x is a float
+_NUM = frozenset({int, float})
+
+def _add(l: Any, r: Any) -> Any:
+    if isinstance(l, str) or isinstance(r, str):
+        return str(l) + str(r)
+    if type(l) in _NUM and type(r) in _NUM:
+        return l + r
+    if isinstance(l, list) and isinstance(r, list):
+        return l + r
+    raise RuntimeError("Operator '+' expects numbers or strings (or list + list)")
+
+def _concat(l: Any, r: Any) -> str:
+    # a `+` the compiler knows concatenates; str() only once both sides exist
+    return str(l) + str(r)
+
+def _sub(l: Any, r: Any) -> Any:
+    raise RuntimeError("Operator '-' expects numbers")
+
+def _mul(l: Any, r: Any) -> Any:
+    raise RuntimeError("Operator '*' expects numbers")
+
+def _div(l: Any, r: Any) -> Any:
+    if not (type(l) in _NUM and type(r) in _NUM):
+        raise RuntimeError("Operator '/' expects numbers")
+    raise RuntimeError("Division by zero")
+
+def _compare(l: Any, r: Any) -> Any:
+    raise RuntimeError("Comparison expects numbers")
+
+def _neg(v: Any) -> Any:
+    raise RuntimeError(f"Unary '-' expects number, got {type(v).__name__}")
+
+def _unknown(name: str) -> Any:
+    raise RuntimeError(f"Unknown name: {name}")
+
+_HELPERS: Dict[str, Any] = {
+    "_NUM": _NUM,
+    "_add": _add,
+    "_concat": _concat,
+    "_sub": _sub,
+    "_mul": _mul,
+    "_div": _div,
+    "_compare": _compare,
+    "_neg": _neg,
+    "_unknown": _unknown,
+}
+
+# op -> (python operator, slow path); the fast path needs both sides numeric
+_NUMERIC_OPS: Dict[str, tuple] = {
+    "PLUS": ("+", "_add"),
+    "MINUS": ("-", "_sub"),
+    "STAR": ("*", "_mul"),
+    "SLASH": ("/", "_div"),
+    "LT": ("<", "_compare"),
+    "GT": (">", "_compare"),
+    "LE": ("<=", "_compare"),
+    "GE": (">=", "_compare"),
+}
+
+_EQUALITY_OPS: Dict[str, str] = {"EQEQ": "==", "NE": "!="}
+
+# the interpreter hooks a generated spell is bound to, in factory order
+BINDINGS = (
+    "G", "K", "S", "call", "proclaim", "index", "invoke", "check_invoke", "be_race", "artifact",
+    "push_region", "pop_region", "bind_call", "call_bound",
+)
+
+# Each operator of a ChainOp nests one more level of parentheses in the source,
+# and CPython's parser caps nesting at 200; a longer run stays on the VM.
+MAX_CHAIN = 64
+
+def _is_num_literal(e: Optional[Expr]) -> bool:
+    return isinstance(e, Num) and type(e.value) in _NUM and math.isfinite(e.value)
+
+_ARITH_OPS = frozenset({"PLUS", "MINUS", "STAR", "SLASH"})
+
+def _is_numeric(e: Expr, numeric: frozenset) -> bool:
+    """True if e always evaluates to an int or float (or raises) when the
+    locals named in `numeric` hold numbers."""
+    if isinstance(e, Num):
+        return type(e.value) in _NUM
+    if isinstance(e, Var):
+        return e.name in numeric
+    if isinstance(e, UnaryOp):
+        return e.op == "NEG" and _is_numeric(e.expr, numeric)
+    if isinstance(e, BinOp):
+        return e.op in _ARITH_OPS and _is_numeric(e.left, numeric) and _is_numeric(e.right, numeric)
+    if isinstance(e, ChainOp):
+        return e.op in _ARITH_OPS and all(_is_numeric(x, numeric) for x in e.operands)
+    return False
+
+def _assignments(body: List[Stmt], out: List[Inscribe]) -> List[Inscribe]:
+    for st in body:
+        if isinstance(st, Inscribe):
+            out.append(st)
+        elif isinstance(st, IfStmt):
+            _assignments(st.then_body, out)
+            _assignments(st.else_body, out)
+        elif isinstance(st, (WhileStmt, InRegion)):
+            _assignments(st.body, out)
+    return out
+
+def _numeric_params(s: SpellDef) -> frozenset:
+    # Start from every parameter and drop those assigned anything not numeric
+    # under the current assumption, until nothing changes.
+    assigns = _assignments(s.body, [])
+    numeric = frozenset(s.params)
+    while True:
+        dropped = {a.name for a in assigns if a.name in numeric and not _is_numeric(a.expr, numeric)}
+        if not dropped:
+            return numeric
+        numeric -= dropped
+
+# -------------------------
+# Generator
+# -------------------------
+class PyGen:
+    def __init__(self, params: List[str], const: Callable[[Any], int], name: Optional[str] = None,
+                 numeric: frozenset = frozenset()):
+        self.const = const
+        # parameters known to hold numbers (the numeric version of a spell)
+        self.numeric = numeric
+        # the spell being generated; None for a block outside any spell, where
+        # `return` is an error the VM reports
+        self.name = name
+        self.nparams = len(params)
+        self.lines: List[str] = []
+        self.temps = 0
+        self.loops = 0
+        # `in ... do` blocks open around the current statement
+        self.regions = 0
+        self.tail_calls = 0
+        # same slot rule as the compiler: a repeated parameter keeps its last slot
+        self.locals: Dict[str, str] = {p: f"a{i}" for i, p in enumerate(params)}
+
+    def temp(self) -> int:
+        self.temps += 1
+        return self.temps
+
+    def line(self, depth: int, text: str) -> None:
+        self.lines.append("    " * depth + text)
+
+    # ---- statements ----
+    def gen_block(self, body: List[Stmt], depth: int) -> None:
+        if not body:
+            self.line(depth, "pass")
+        for st in body:
+            self.gen_stmt(st, depth)
+
+    def gen_stmt(self, s: Stmt, depth: int) -> None:
+        handler = _STMT_GEN.get(type(s))
+        if handler is None:
+            raise _Unsupported(type(s).__name__)
+        handler(self, s, depth)
+
+    def _inscribe(self, s: Inscribe, depth: int) -> None:
+        value = self.gen_expr(s.expr)
+        local = self.locals.get(s.name)
+        if local is not None:
+            self.line(depth, f"{local} = {value}")
+        else:
+            self.line(depth, f"G[{s.name!r}] = {value}")
+
+    def _proclaim(self, s: Proclaim, depth: int) -> None:
+        self.line(depth, f"proclaim({self.gen_expr(s.expr)})")
+
+    def _expr_stmt(self, s: ExprStmt, depth: int) -> None:
+        self.line(depth, self.gen_expr(s.expr))
+
+    def _be_race(self, s: BeRace, depth: int) -> None:
+        self.line(depth, f"be_race({s.race!r})")
+
+    def _artifact(self, s: ArtifactAction, depth: int) -> None:
+        self.line(depth, f"artifact({s.action!r}, {s.artifact!r})")
+
+    def _if(self, s: IfStmt, depth: int) -> None:
+        self.line(depth, f"if {self.gen_expr(s.cond)}:")
+        self.gen_block(s.then_body, depth + 1)
+        if s.else_body:
+            self.line(depth, "else:")
+            self.gen_block(s.else_body, depth + 1)
+
+    def _while(self, s: WhileStmt, depth: int) -> None:
+        self.line(depth, f"while {self.gen_expr(s.cond)}:")
+        self.loops += 1
+        self.gen_block(s.body, depth + 1)
+        self.loops -= 1
+
+    def _in_region(self, s: InRegion, depth: int) -> None:
+        self.line(depth, f"push_region({s.region!r})")
+        self.regions += 1
+        self.gen_block(s.body, depth)
+        self.regions -= 1
+        self.line(depth, "pop_region()")
+
+    def _return(self, s: ReturnStmt, depth: int) -> None:
+        if self.name is None:
+            raise _Unsupported("return outside a spell")
+        e = s.expr
+        if (isinstance(e, Call) and e.name == self.name and len(e.args) == self.nparams
+                and not self.loops and not self.regions):
+            self._tail_call(e, depth)
+        elif self.regions:
+            # the value is computed inside the regions, which close after it
+            value = "None" if e is None else self.gen_expr(e)
+            n = self.temp()
+            self.line(depth, f"_rv{n} = {value}")
+            for _ in range(self.regions):
+                self.line(depth, "pop_region()")
+            self.line(depth, f"return _rv{n}")
+        elif e is None:
+            self.line(depth, "return None")
+        else:
+            self.line(depth, f"return {self.gen_expr(e)}")
+
+    def _tail_call(self, e: Call, depth: int) -> None:
+        # A self tail call rebinds the parameters and restarts the body (see
+        # _factory), unless the name has since been bound to another spell.
+        # As in a real call, the callee is resolved before the arguments run.
+        self.tail_calls += 1
+        n = self.temp()
+        quiet = all(is_quiet(a, self.locals) for a in e.args)
+        callee = f"S[{e.name!r}]" if quiet else f"_s{n}"
+        if not quiet:
+            self.line(depth, f"_s{n} = bind_call({e.name!r}, {len(e.args)})")
+        self.line(depth, f"_tc{n} = ({''.join(self.gen_expr(a) + ', ' for a in e.args)})")
+        self.line(depth, f"if {callee}.fn is spell:")
+        if self.nparams:
+            self.line(depth + 1, f"{', '.join(f'a{i}' for i in range(self.nparams))}, = _tc{n}")
+        self.line(depth + 1, "continue")
+        if quiet:
+            self.line(depth, f"return call({e.name!r}, list(_tc{n}))")
+        else:
+            self.line(depth, f"return call_bound(_s{n}, {e.name!r}, list(_tc{n}))")
+
+    # ---- expressions ----
+    def gen_expr(self, e: Expr) -> str:
+        handler = _EXPR_GEN.get(type(e))
+        if handler is None:
+            raise _Unsupported(type(e).__name__)
+        return handler(self, e)
+
+    def gen_args(self, args: List[Expr]) -> str:
+        return "[" + ", ".join(self.gen_expr(a) for a in args) + "]"
+
+    def _literal(self, e: Num | Str | BoolLit) -> str:
+        v = e.value
+        if type(v) in (int, str, bool) or (type(v) is float and math.isfinite(v)):
+            return repr(v)
+        return f"K[{self.const(v)}]"
+
+    def _nil(self, e: NilLit) -> str:
+        return "None"
+
+    def _var(self, e: Var) -> str:
+        local = self.locals.get(e.name)
+        if local is not None:
+            return local
+        key = repr(e.name)
+        return f"(G[{key}] if {key} in G else _unknown({key}))"
+
+    def _binop(self, e: BinOp) -> str:
+        left = self.gen_expr(e.left)
+        right = self.gen_expr(e.right)
+        if e.op == "PLUS" and (is_str_expr(e.left) or is_str_expr(e.right)):
+            return self.concat(is_str_expr(e.left), left, e.right, right)
+        if _is_numeric(e.left, self.numeric) and self.unchecked(e.op, e.right):
+            return f"({left} {_NUMERIC_OPS[e.op][0]} {right})"
+        return self.binary(e.op, e.left, left, e.right, right)
+
+    def _chainop(self, e: ChainOp) -> str:
+        operands = e.operands
+        if len(operands) > MAX_CHAIN:
+            raise _Unsupported("ChainOp")
+        src = self.gen_expr(operands[0])
+        left: Optional[Expr] = operands[0]
+        # once a string joins a run of `+`, every later step concatenates
+        is_str = e.op == "PLUS" and is_str_expr(operands[0])
+        is_num = _is_numeric(operands[0], self.numeric)
+        for x in operands[1:]:
+            if e.op == "PLUS" and (is_str or is_str_expr(x)):
+                src = self.concat(is_str, src, x, self.gen_expr(x))
+                is_str = True
+            elif is_num and self.unchecked(e.op, x):
+                src = f"({src} {_NUMERIC_OPS[e.op][0]} {self.gen_expr(x)})"
+                # a comparison gives a bool, which the next step must check
+                is_num = e.op in _ARITH_OPS
+            else:
+                is_num = False
+                src = self.binary(e.op, left, src, x, self.gen_expr(x))
+            left = None  # a partial result, never a literal
+        return src
+
+    # Source for a `+` known to concatenate (BINARY_CONCAT in the VM). A side
+    # already known to be a str needs no str(); otherwise str() may only run
+    # once both sides are evaluated (the right one could mutate a list on the
+    # left), which inline code can only promise when the right is a literal.
+    def concat(self, left_is_str: bool, left: str, right_node: Expr, right: str) -> str:
+        if left_is_str:
+            if isinstance(right_node, (Num, BoolLit)):
+                right = repr(str(right_node.value))
+            elif isinstance(right_node, NilLit):
+                right = repr(str(None))
+            elif not is_str_expr(right_node):
+                right = f"str({right})"
+            return f"({left} + {right})"
+        if isinstance(right_node, Str):
+            return f"(str({left}) + {right})"
+        return f"_concat({left}, {right})"
+
+    # Whether `left op right`, with a left side known to be a number, can be
+    # plain Python: the right side must be one too, and a divisor must be a
+    # non-zero literal (a zero check would evaluate the sides out of order).
+    def unchecked(self, op: str, right_node: Expr) -> bool:
+        if op == "SLASH":
+            return _is_num_literal(right_node) and bool(right_node.value)
+        return op in _NUMERIC_OPS and _is_numeric(right_node, self.numeric)
+
+    # Source for `left op right`; the nodes only say which side is a numeric literal.
+    def binary(self, op: str, left_node: Optional[Expr], left: str, right_node: Expr, right: str) -> str:
+        if op in _EQUALITY_OPS:
+            return f"({left} {_EQUALITY_OPS[op]} {right})"
+        if op not in _NUMERIC_OPS:
+            raise RuntimeError(f"Unknown binary op: {op}")
+        py_op, slow = _NUMERIC_OPS[op]
+        n = self.temp()
+        # both operands are evaluated (left first) before either is checked;
+        # a numeric literal needs neither a temporary nor a check
+        checks = []
+        if _is_num_literal(left_node):
+            l = left
+        else:
+            l = f"_l{n}"
+            checks.append(f"(type({l} := {left}) in _NUM)")
+        if _is_num_literal(right_node):
+            r = right
+        else:
+            r = f"_r{n}"
+            checks.append(f"(type({r} := {right}) in _NUM)")
+        guard = " & ".join(checks)
+        if op == "SLASH" and not (_is_num_literal(right_node) and right_node.value):
+            guard = f"{guard} and {r}" if guard else r
+        if not guard:
+            return f"({l} {py_op} {r})"
+        return f"({l} {py_op} {r} if {guard} else {slow}({l}, {r}))"
+
+    def _unaryop(self, e: UnaryOp) -> str:
+        if e.op != "NEG":
+            raise RuntimeError(f"Unknown unary op: {e.op}")
+        if _is_numeric(e.expr, self.numeric):
+            return f"(-{self.gen_expr(e.expr)})"
+        u = f"_u{self.temp()}"
+        return f"(-{u} if type({u} := {self.gen_expr(e.expr)}) in _NUM else _neg({u}))"
+
+    def _call(self, e: Call) -> str:
+        # as Compiler._call, the callee is resolved before the arguments run
+        if all(is_quiet(a, self.locals) for a in e.args):
+            return f"call({e.name!r}, {self.gen_args(e.args)})"
+        return f"call_bound(bind_call({e.name!r}, {len(e.args)}), {e.name!r}, {self.gen_args(e.args)})"
+
+    def _invoke(self, e: Invoke) -> str:
+        # the same (target, fn) constant the bytecode's INVOKE uses
+        k = self.const((e.target, SAFE_INVOKE[e.target]))
+        # check_invoke() returns None; it runs before the arguments, as in the VM
+        return f"(check_invoke() or invoke(K[{k}], {self.gen_args(e.args)}))"
+
+    def _folded_invoke(self, e: FoldedInvoke) -> str:
+        # check_invoke() returns None, so this yields the folded value
+        return f"(check_invoke() or K[{self.const(e.value)}])"
+
+    def _index(self, e: Index) -> str:
+        return f"index({self.gen_expr(e.target)}, {self.gen_expr(e.index)})"
+
+    def _list(self, e: ListLit) -> str:
+        return self.gen_args(e.items)
+
+    def _dict(self, e: DictLit) -> str:
+        return "{" + ", ".join(f"{self.gen_expr(k)}: {self.gen_expr(v)}" for k, v in e.items) + "}"
+
+_STMT_GEN: Dict[type, Callable[[PyGen, Any, int], None]] = {
+    Inscribe: PyGen._inscribe,
+    Proclaim: PyGen._proclaim,
+    ExprStmt: PyGen._expr_stmt,
+    BeRace: PyGen._be_race,
+    ArtifactAction: PyGen._artifact,
+    IfStmt: PyGen._if,
+    WhileStmt: PyGen._while,
+    ReturnStmt: PyGen._return,
+    InRegion: PyGen._in_region,
+}
+
+_EXPR_GEN: Dict[type, Callable[[PyGen, Any], str]] = {
+    Num: PyGen._literal,
+    Str: PyGen._literal,
+    BoolLit: PyGen._literal,
+    NilLit: PyGen._nil,
+    Var: PyGen._var,
+    BinOp: PyGen._binop,
+    ChainOp: PyGen._chainop,
+    UnaryOp: PyGen._unaryop,
+    Call: PyGen._call,
+    Invoke: PyGen._invoke,
+    FoldedInvoke: PyGen._folded_invoke,
+    Index: PyGen._index,
+    ListLit: PyGen._list,
+    DictLit: PyGen._dict,
+}
+
+# -------------------------
+# Entry points
+# -------------------------
+def _factory(g: PyGen, fast: Optional[PyGen] = None) -> str:
+    params = ", ".join(f"a{i}" for i in range(g.nparams))
+    head = [
+        f"def make({', '.join(BINDINGS)}):",
+        f"    def spell({params}):",
+    ]
+    body = g.lines
+    if fast is not None:
+        # the numeric version, generated one level deeper; a self tail call
+        # continues back to this check with the new arguments
+        guard = " and ".join(sorted({f"type({fast.locals[p]}) in _NUM" for p in fast.numeric}))
+        body = [f"        if {guard}:"] + fast.lines + ["        else:"] + ["    " + ln for ln in body]
+    if g.tail_calls:
+        # the loop that tail calls continue; falling off the end returns None
+        body = ["        while True:"] + ["    " + ln for ln in body] + ["            return None"]
+    tail = ["    return spell"]
+    return "\n".join(head + body + tail) + "\n"
+
+def codegen_spell(s: SpellDef, const: Callable[[Any], int]) -> Optional[str]:
+    """Python source for a factory that binds and returns the spell, or None
+    if the body uses something only the VM can run. `const` registers a value
+    in the spell's constant table (the generated code reads it as K[k])."""
+    g = PyGen(s.params, const, s.name)
+    fast: Optional[PyGen] = None
+    try:
+        g.gen_block(s.body, 2)
+        numeric = _numeric_params(s)
+        if numeric:
+            fast = PyGen(s.params, const, s.name, numeric)
+            fast.gen_block(s.body, 3)
+            if [ln[4:] for ln in fast.lines] == g.lines:
+                fast = None  # nothing to gain
+    except _Unsupported:
+        return None
+    return _compilable(_factory(g, fast))
+
+def codegen_block(body: List[Stmt], const: Callable[[Any], int]) -> Optional[str]:
+    """Same as codegen_spell, for statements outside any spell (every name is
+    a global); the bound function takes no arguments."""
+    g = PyGen([], const)
+    try:
+        g.gen_block(body, 2)
+    except _Unsupported:
+        return None
+    return _compilable(_factory(g))
+
+def _compilable(src: str) -> Optional[str]:
+    # Deeply nested expressions can exceed what CPython's parser accepts (200
+    # levels of parentheses) or its recursion limit; such a body runs as
+    # bytecode instead. Compiling here also primes load_factory's cache.
+    try:
+        load_factory(src)
+    except (SyntaxError, RecursionError, MemoryError):
+        return None
+    return src
+
+@lru_cache(maxsize=256)
+def load_factory(src: str) -> Callable[..., Callable[..., Any]]:
+    # compiled once per distinct source, however often it is bound
+    ns: Dict[str, Any] = dict(_HELPERS)
+    exec(compile(src, "<spell>", "exec"), ns)
+    return ns["make"]
@@ -0,0 +1,426 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .tokens import RuntimeError
+from .lexer import tokenize
+from .parser import Parser
+from .folding import fold_program, is_quiet, is_str_expr
+from .library import SAFE_INVOKE
+from .codegen import codegen_spell, codegen_block
+from .ast_nodes import (
+    # expr
+    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, ChainOp, Call, Invoke, FoldedInvoke,
+    ListLit, DictLit, Index,
+    # stmt
+    Stmt, Inscribe, Proclaim, ExprStmt, IfStmt, WhileStmt, SpellDef, ReturnStmt,
+    InRegion, BeRace, ArtifactAction
+)
+
+# Bump whenever the instruction set, the Code layout or the shape of generated
+# Python (codegen.BINDINGS) changes: it is part of the on-disk cache key, so
+# stale compiled programs are never loaded.
+BYTECODE_VERSION = 11
+
+# -------------------------
+# Opcodes
+# -------------------------
+# Instructions are laid out inline in a flat int list: the opcode followed by
+# its operands (if any). Jump operands are absolute offsets into the list.
+LOAD_CONST = 0      # k            push consts[k]
+LOAD_GLOBAL = 1     # n            push globals[names[n]]
+STORE_GLOBAL = 2    # n            pop -> globals[names[n]]
+POP_TOP = 3         #              discard top of stack
+JUMP = 4            # target
+JUMP_IF_FALSE = 5   # target       pop; jump if falsy
+BINARY_ADD = 6
+BINARY_SUB = 7
+BINARY_MUL = 8
+BINARY_DIV = 9
+COMPARE_LT = 10
+COMPARE_GT = 11
+COMPARE_LE = 12
+COMPARE_GE = 13
+COMPARE_EQ = 14
+COMPARE_NE = 15
+UNARY_NEG = 16
+BUILD_LIST = 17     # count
+BUILD_DICT = 18     # count        count (key, value) pairs
+INDEX = 19
+CALL = 20           # n argc       call names[n] with argc stacked args
+INVOKE = 21         # k argc       call consts[k] (target, fn) with argc stacked args
+RETURN = 22         #              pop -> return value of the frame
+PROCLAIM = 23       #              pop -> region-aware print
+PUSH_REGION = 24    # k
+POP_REGION = 25
+SET_RACE = 26       # k
+ARTIFACT = 27       # k_action k_artifact
+DEF_SPELL = 28      # k            register consts[k] (a Code) as a spell
+CHECK_INVOKE = 29   #              raise if invoke is currently forbidden (ahead of its args)
+BIND_CALL = 30      # n argc       push the spell names[n] is (None for a built-in), arity-checked
+CALL_BOUND = 31     # n argc       call the BIND_CALL result below argc stacked args
+LOAD_FAST = 32      # slot         push frame slot
+STORE_FAST = 33     # slot         pop -> frame slot
+INVOKE1 = 34        # k            call consts[k] (target, fn) on the top of stack
+RUN_PYTHON = 35     # k            bind and run consts[k], Python source for a block
+BINARY_CONCAT = 36  #              str(l) + str(r): a `+` with an operand known to be a str
+
+# Specialized forms (numbered from 100). The compiler never emits these: the
+# VM rewrites a generic instruction in place once it has seen its operand
+# types (an inline cache), and rewrites it back if the guard ever fails.
+BINARY_ADD_NUM = 100  #            int/float + int/float
+BINARY_ADD_STR = 101  #            str + anything (concatenation)
+
+BINARY_OPS: Dict[str, int] = {
+    "PLUS": BINARY_ADD,
+    "MINUS": BINARY_SUB,
+    "STAR": BINARY_MUL,
+    "SLASH": BINARY_DIV,
+    "LT": COMPARE_LT,
+    "GT": COMPARE_GT,
+    "LE": COMPARE_LE,
+    "GE": COMPARE_GE,
+    "EQEQ": COMPARE_EQ,
+    "NE": COMPARE_NE,
+}
+
+@dataclass
+class Code:
+    name: str
+    params: List[str]
+    code: List[int] = field(default_factory=list)
+    consts: List[Any] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    # result depends only on the arguments; the runtime may memoize calls
+    pure: bool = False
+    # Python source for the same spell body (see codegen.py), if it has one
+    pysrc: Optional[str] = None
+
+# -------------------------
+# Compiler
+# -------------------------
+class Compiler:
+    def __init__(self, name: str, params: List[str]):
+        self.co = Code(name, list(params))
+        self._const_index: Dict[Tuple[type, Any], int] = {}
+        self._name_index: Dict[str, int] = {}
+        # Only spell parameters are frame-local: an inscribe of any other name
+        # inside a spell writes through to the globals, so every other name
+        # is a global. A repeated parameter keeps its last slot.
+        self.locals: Dict[str, int] = {p: i for i, p in enumerate(params)}
+
+    # ---- emit helpers ----
+    def emit(self, *words: int) -> int:
+        pos = len(self.co.code)
+        self.co.code.extend(words)
+        return pos
+
+    def patch(self, pos: int, target: int) -> None:
+        # pos is the offset of the jump opcode; its operand follows it
+        self.co.code[pos + 1] = target
+
+    def here(self) -> int:
+        return len(self.co.code)
+
+    def const(self, value: Any) -> int:
+        # key on the type too, so 1 / 1.0 / true stay distinct constants
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            self.co.consts.append(value)
+            return len(self.co.consts) - 1
+        k = self._const_index.get(key)
+        if k is None:
+            k = self._const_index[key] = len(self.co.consts)
+            self.co.consts.append(value)
+        return k
+
+    def name(self, name: str) -> int:
+        n = self._name_index.get(name)
+        if n is None:
+            n = self._name_index[name] = len(self.co.names)
+            self.co.names.append(name)
+        return n
+
+    # ---- statements ----
+    def compile_block(self, body: List[Stmt]) -> None:
+        for st in body:
+            self.compile_stmt(st)
+
+    def compile_stmt(self, s: Stmt) -> None:
+        handler = _STMT_COMPILERS.get(type(s))
+        if handler is None:
+            raise RuntimeError(f"Unknown statement type: {type(s).__name__}")
+        handler(self, s)
+
+    def _inscribe(self, s: Inscribe) -> None:
+        self.compile_expr(s.expr)
+        slot = self.locals.get(s.name)
+        if slot is not None:
+            self.emit(STORE_FAST, slot)
+        else:
+            self.emit(STORE_GLOBAL, self.name(s.name))
+
+    def _proclaim(self, s: Proclaim) -> None:
+        self.compile_expr(s.expr)
+        self.emit(PROCLAIM)
+
+    def _expr_stmt(self, s: ExprStmt) -> None:
+        self.compile_expr(s.expr)
+        self.emit(POP_TOP)
+
+    def _be_race(self, s: BeRace) -> None:
+        self.emit(SET_RACE, self.const(s.race))
+
+    def _in_region(self, s: InRegion) -> None:
+        self.emit(PUSH_REGION, self.const(s.region))
+        self.compile_block(s.body)
+        self.emit(POP_REGION)
+
+    def _artifact(self, s: ArtifactAction) -> None:
+        self.emit(ARTIFACT, self.const(s.action), self.const(s.artifact))
+
+    def _if(self, s: IfStmt) -> None:
+        self.compile_expr(s.cond)
+        to_else = self.emit(JUMP_IF_FALSE, 0)
+        self.compile_block(s.then_body)
+        if s.else_body:
+            to_end = self.emit(JUMP, 0)
+            self.patch(to_else, self.here())
+            self.compile_block(s.else_body)
+            self.patch(to_end, self.here())
+        else:
+            self.patch(to_else, self.here())
+
+    def _while(self, s: WhileStmt) -> None:
+        if not self.locals:
+            # no frame slots to share, so the whole loop can run as Python
+            src = codegen_block([s], self.const)
+            if src is not None:
+                self.emit(RUN_PYTHON, self.const(src))
+                return
+        top = self.here()
+        self.compile_expr(s.cond)
+        to_end = self.emit(JUMP_IF_FALSE, 0)
+        self.compile_block(s.body)
+        self.emit(JUMP, top)
+        self.patch(to_end, self.here())
+
+    def _spell_def(self, s: SpellDef) -> None:
+        self.emit(DEF_SPELL, self.const(compile_spell(s)))
+
+    def _return(self, s: ReturnStmt) -> None:
+        if s.expr is None:
+            self.emit(LOAD_CONST, self.const(None))
+        else:
+            self.compile_expr(s.expr)
+        self.emit(RETURN)
+
+    # ---- expressions ----
+    def compile_expr(self, e: Expr) -> None:
+        handler = _EXPR_COMPILERS.get(type(e))
+        if handler is None:
+            raise RuntimeError(f"Unknown expression type: {type(e).__name__}")
+        handler(self, e)
+
+    def _literal(self, e: Num | Str | BoolLit) -> None:
+        self.emit(LOAD_CONST, self.const(e.value))
+
+    def _nil(self, e: NilLit) -> None:
+        self.emit(LOAD_CONST, self.const(None))
+
+    def _var(self, e: Var) -> None:
+        slot = self.locals.get(e.name)
+        if slot is not None:
+            self.emit(LOAD_FAST, slot)
+        else:
+            self.emit(LOAD_GLOBAL, self.name(e.name))
+
+    def _binop(self, e: BinOp) -> None:
+        op = BINARY_OPS.get(e.op)
+        if op is None:
+            raise RuntimeError(f"Unknown binary op: {e.op}")
+        if op == BINARY_ADD and (is_str_expr(e.left) or is_str_expr(e.right)):
+            op = BINARY_CONCAT
+        self.compile_expr(e.left)
+        self.compile_expr(e.right)
+        self.emit(op)
+
+    def _chainop(self, e: ChainOp) -> None:
+        # the same code as the BinOp tree: each operator follows its right operand
+        op = BINARY_OPS.get(e.op)
+        if op is None:
+            raise RuntimeError(f"Unknown binary op: {e.op}")
+        operands = e.operands
+        self.compile_expr(operands[0])
+        # once a string joins a run of `+`, every later step concatenates
+        concat = op == BINARY_ADD and is_str_expr(operands[0])
+        for x in operands[1:]:
+            self.compile_expr(x)
+            if op == BINARY_ADD and not concat:
+                concat = is_str_expr(x)
+            self.emit(BINARY_CONCAT if concat else op)
+
+    def _unaryop(self, e: UnaryOp) -> None:
+        if e.op != "NEG":
+            raise RuntimeError(f"Unknown unary op: {e.op}")
+        self.compile_expr(e.expr)
+        self.emit(UNARY_NEG)
+
+    def _call(self, e: Call) -> None:
+        # The callee is resolved, and a spell's arity checked, before the
+        # arguments run (built-ins check theirs afterwards). Arguments that
+        # can neither fail nor run code leave nothing to order.
+        if all(is_quiet(a, self.locals) for a in e.args):
+            for a in e.args:
+                self.compile_expr(a)
+            self.emit(CALL, self.name(e.name), len(e.args))
+            return
+        self.emit(BIND_CALL, self.name(e.name), len(e.args))
+        for a in e.args:
+            self.compile_expr(a)
+        self.emit(CALL_BOUND, self.name(e.name), len(e.args))
+
+    def _invoke(self, e: Invoke) -> None:
+        fn = SAFE_INVOKE[e.target]  # the parser has already rejected unknown targets
+        # the Mordor rule is checked before the arguments run, and only then
+        self.emit(CHECK_INVOKE)
+        for a in e.args:
+            self.compile_expr(a)
+        k = self.const((e.target, fn))
+        if len(e.args) == 1:
+            self.emit(INVOKE1, k)
+        else:
+            self.emit(INVOKE, k, len(e.args))
+
+    def _folded_invoke(self, e: FoldedInvoke) -> None:
+        self.emit(CHECK_INVOKE)
+        self.emit(LOAD_CONST, self.const(e.value))
+
+    def _index(self, e: Index) -> None:
+        self.compile_expr(e.target)
+        self.compile_expr(e.index)
+        self.emit(INDEX)
+
+    def _list(self, e: ListLit) -> None:
+        for it in e.items:
+            self.compile_expr(it)
+        self.emit(BUILD_LIST, len(e.items))
+
+    def _dict(self, e: DictLit) -> None:
+        for k_expr, v_expr in e.items:
+            self.compile_expr(k_expr)
+            self.compile_expr(v_expr)
+        self.emit(BUILD_DICT, len(e.items))
+
+# One dict lookup on the exact node type instead of an isinstance ladder.
+_STMT_COMPILERS: Dict[type, Callable[[Compiler, Any], None]] = {
+    Inscribe: Compiler._inscribe,
+    Proclaim: Compiler._proclaim,
+    ExprStmt: Compiler._expr_stmt,
+    BeRace: Compiler._be_race,
+    InRegion: Compiler._in_region,
+    ArtifactAction: Compiler._artifact,
+    IfStmt: Compiler._if,
+    WhileStmt: Compiler._while,
+    SpellDef: Compiler._spell_def,
+    ReturnStmt: Compiler._return,
+}
+
+_EXPR_COMPILERS: Dict[type, Callable[[Compiler, Any], None]] = {
+    Num: Compiler._literal,
+    Str: Compiler._literal,
+    BoolLit: Compiler._literal,
+    NilLit: Compiler._nil,
+    Var: Compiler._var,
+    BinOp: Compiler._binop,
+    ChainOp: Compiler._chainop,
+    UnaryOp: Compiler._unaryop,
+    Call: Compiler._call,
+    Invoke: Compiler._invoke,
+    FoldedInvoke: Compiler._folded_invoke,
+    Index: Compiler._index,
+    ListLit: Compiler._list,
+    DictLit: Compiler._dict,
+}
+
+# -------------------------
+# Purity
+# -------------------------
+# Built-ins that only look at their arguments (no lore state, no output).
+# Calls that pass lists/dicts are never memoized, so the mutating collection
+# helpers are safe here too.
+PURE_BUILTINS = frozenset({
+    "length", "push", "pop", "get", "put", "has", "keys", "values",
+    "ring", "mellon", "gandalf", "you_shall_not_pass", "precious",
+})
+
+def _pure_expr(e: Expr, s: SpellDef) -> bool:
+    if isinstance(e, (Num, Str, BoolLit, NilLit)):
+        return True
+    if isinstance(e, Var):
+        # any other name is a global, which may change between calls
+        return e.name in s.params
+    if isinstance(e, BinOp):
+        return _pure_expr(e.left, s) and _pure_expr(e.right, s)
+    if isinstance(e, ChainOp):
+        return all(_pure_expr(x, s) for x in e.operands)
+    if isinstance(e, UnaryOp):
+        return _pure_expr(e.expr, s)
+    if isinstance(e, Index):
+        return _pure_expr(e.target, s) and _pure_expr(e.index, s)
+    if isinstance(e, ListLit):
+        return all(_pure_expr(it, s) for it in e.items)
+    if isinstance(e, DictLit):
+        return all(_pure_expr(k, s) and _pure_expr(v, s) for k, v in e.items)
+    if isinstance(e, Call):
+        if e.name != s.name and e.name not in PURE_BUILTINS:
+            return False
+        return all(_pure_expr(a, s) for a in e.args)
+    # invoke is gated by the Mordor/Ring rule, so it depends on lore state
+    return False
+
+def _pure_block(body: List[Stmt], s: SpellDef) -> bool:
+    for st in body:
+        if isinstance(st, Inscribe):
+            if st.name not in s.params or not _pure_expr(st.expr, s):
+                return False
+        elif isinstance(st, ExprStmt):
+            if not _pure_expr(st.expr, s):
+                return False
+        elif isinstance(st, ReturnStmt):
+            if st.expr is not None and not _pure_expr(st.expr, s):
+                return False
+        elif isinstance(st, IfStmt):
+            if not (_pure_expr(st.cond, s) and _pure_block(st.then_body, s) and _pure_block(st.else_body, s)):
+                return False
+        elif isinstance(st, WhileStmt):
+            if not (_pure_expr(st.cond, s) and _pure_block(st.body, s)):
+                return False
+        else:
+            # proclaim, regions, races, artifacts and nested spells all touch
+            # interpreter state
+            return False
+    return True
+
+def is_pure_spell(s: SpellDef) -> bool:
+    return _pure_block(s.body, s)
+
+def compile_program(program: List[Stmt]) -> Code:
+    program = fold_program(program)
+    c = Compiler("<program>", [])
+    c.compile_block(program)
+    return c.co
+
+def compile_spell(s: SpellDef) -> Code:
+    c = Compiler(s.name, s.params)
+    c.compile_block(s.body)
+    c.emit(LOAD_CONST, c.const(None))
+    c.emit(RETURN)
+    c.co.pure = is_pure_spell(s)
+    c.co.pysrc = codegen_spell(s, c.const)
+    return c.co
+
+def compile_source(src: str) -> Code:
+    return compile_program(Parser(tokenize(src)).parse_program())
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import operator
+from typing import Any, Callable, Container, Dict, List
+
+from .library import SAFE_INVOKE
+from .ast_nodes import (
+    # expr
+    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, ChainOp, Call, Invoke, FoldedInvoke,
+    ListLit, DictLit, Index,
+    # stmt
+    Stmt, Inscribe, Proclaim, ExprStmt, IfStmt, WhileStmt, SpellDef, ReturnStmt,
+    InRegion
+)
+
+# -------------------------
+# Constant folding
+# -------------------------
+# Runs once over the parsed program, before compilation, so constant parts of
+# loop conditions and bodies are not recomputed on every iteration. Folding
+# follows the runtime's operator semantics exactly; anything that would raise
+# (type mismatch, division by zero, a failing invoke) is left unfolded so the
+# error still happens at runtime.
+
+_NO_FOLD = object()
+
+def _is_num(v: Any) -> bool:
+    t = type(v)
+    return t is int or t is float
+
+def _literal_value(e: Expr) -> Any:
+    if isinstance(e, (Num, Str, BoolLit)):
+        return e.value
+    if isinstance(e, NilLit):
+        return None
+    return _NO_FOLD
+
+def _as_literal(v: Any) -> Expr:
+    if isinstance(v, bool):
+        return BoolLit(v)
+    if isinstance(v, str):
+        return Str(v)
+    if v is None:
+        return NilLit()
+    return Num(v)
+
+# operators that fold for any pair of literals...
+_ANY_FOLDS: Dict[str, Callable[[Any, Any], Any]] = {
+    "EQEQ": operator.eq,
+    "NE": operator.ne,
+}
+# ...and those that only fold for two numbers (PLUS and SLASH have extra rules)
+_NUMERIC_FOLDS: Dict[str, Callable[[Any, Any], Any]] = {
+    "PLUS": operator.add,
+    "MINUS": operator.sub,
+    "STAR": operator.mul,
+    "SLASH": operator.truediv,
+    "LT": operator.lt,
+    "GT": operator.gt,
+    "LE": operator.le,
+    "GE": operator.ge,
+}
+
+def _concat(l: Any, r: Any) -> str:
+    return str(l) + str(r)
+
+def _apply_binop(op: str, l: Any, r: Any) -> Any:
+    fn = _ANY_FOLDS.get(op)
+    if op == "PLUS" and (isinstance(l, str) or isinstance(r, str)):
+        fn = _concat
+    elif fn is None:
+        fn = _NUMERIC_FOLDS.get(op)
+        if fn is None or not (_is_num(l) and _is_num(r)):
+            return _NO_FOLD
+        if op == "SLASH" and r == 0:
+            return _NO_FOLD
+    # e.g. a huge int divided or mixed with a float (OverflowError), or one
+    # too long for str() (ValueError): left for the runtime, which may never
+    # get there
+    try:
+        return fn(l, r)
+    except (ArithmeticError, ValueError):
+        return _NO_FOLD
+
+# True if evaluating `e` can neither fail nor be observed: a literal or a spell
+# parameter. Checks that must come before a call's arguments (see
+# Compiler._call) are skipped when every argument is quiet.
+def is_quiet(e: Expr, params: Container[str]) -> bool:
+    if isinstance(e, (Num, Str, BoolLit, NilLit)):
+        return True
+    return isinstance(e, Var) and e.name in params
+
+# True if `e` always evaluates to a str: a string literal, or a `+` with such an
+# operand (which concatenates, and so does every later `+` in its run).
+def is_str_expr(e: Expr) -> bool:
+    if isinstance(e, Str):
+        return True
+    if isinstance(e, BinOp):
+        return e.op == "PLUS" and (is_str_expr(e.left) or is_str_expr(e.right))
+    if isinstance(e, ChainOp):
+        return e.op == "PLUS" and any(is_str_expr(x) for x in e.operands)
+    return False
+
+# ---- expressions ----
+def fold_expr(e: Expr) -> Expr:
+    handler = _FOLD_EXPR.get(type(e))
+    return handler(e) if handler is not None else e
+
+def _fold_binop(e: BinOp) -> Expr:
+    left = fold_expr(e.left)
+    right = fold_expr(e.right)
+    l = _literal_value(left)
+    r = _literal_value(right)
+    if l is not _NO_FOLD and r is not _NO_FOLD:
+        v = _apply_binop(e.op, l, r)
+        if v is not _NO_FOLD:
+            return _as_literal(v)
+    return BinOp(left, e.op, right)
+
+def _fold_chainop(e: ChainOp) -> Expr:
+    operands = [fold_expr(x) for x in e.operands]
+    # evaluation is left to right, so only a literal prefix can be folded
+    acc = _literal_value(operands[0])
+    n = 1
+    if acc is not _NO_FOLD:
+        while n < len(operands):
+            r = _literal_value(operands[n])
+            if r is _NO_FOLD:
+                break
+            v = _apply_binop(e.op, acc, r)
+            if v is _NO_FOLD:
+                break
+            acc = v
+            n += 1
+    if n > 1:
+        operands = [_as_literal(acc)] + operands[n:]
+    if len(operands) == 1:
+        return operands[0]
+    if len(operands) == 2:
+        return BinOp(operands[0], e.op, operands[1])
+    return ChainOp(e.op, operands)
+
+def _fold_unaryop(e: UnaryOp) -> Expr:
+    inner = fold_expr(e.expr)
+    if e.op == "NEG" and isinstance(inner, Num):
+        return Num(-inner.value)
+    return UnaryOp(e.op, inner)
+
+def _fold_invoke(e: Invoke) -> Expr:
+    args = [fold_expr(a) for a in e.args]
+    fn = SAFE_INVOKE.get(e.target)
+    values = [_literal_value(a) for a in args]
+    if fn is not None and _NO_FOLD not in values:
+        try:
+            return FoldedInvoke(e.target, fn(*values))
+        except Exception:
+            pass
+    return Invoke(e.target, args)
+
+def _fold_call(e: Call) -> Expr:
+    return Call(e.name, [fold_expr(a) for a in e.args])
+
+def _fold_index(e: Index) -> Expr:
+    return Index(fold_expr(e.target), fold_expr(e.index))
+
+def _fold_list(e: ListLit) -> Expr:
+    return ListLit([fold_expr(it) for it in e.items])
+
+def _fold_dict(e: DictLit) -> Expr:
+    return DictLit([(fold_expr(k), fold_expr(v)) for k, v in e.items])
+
+_FOLD_EXPR: Dict[type, Callable[[Any], Expr]] = {
+    BinOp: _fold_binop,
+    ChainOp: _fold_chainop,
+    UnaryOp: _fold_unaryop,
+    Invoke: _fold_invoke,
+    Call: _fold_call,
+    Index: _fold_index,
+    ListLit: _fold_list,
+    DictLit: _fold_dict,
+}
+
+# ---- statements ----
+def fold_block(body: List[Stmt]) -> List[Stmt]:
+    return [fold_stmt(st) for st in body]
+
+def fold_stmt(s: Stmt) -> Stmt:
+    handler = _FOLD_STMT.get(type(s))
+    # BeRace / ArtifactAction carry no expressions
+    return handler(s) if handler is not None else s
+
+def _fold_inscribe(s: Inscribe) -> Stmt:
+    return Inscribe(s.name, fold_expr(s.expr))
+
+def _fold_proclaim(s: Proclaim) -> Stmt:
+    return Proclaim(fold_expr(s.expr))
+
+def _fold_expr_stmt(s: ExprStmt) -> Stmt:
+    return ExprStmt(fold_expr(s.expr))
+
+def _fold_if(s: IfStmt) -> Stmt:
+    return IfStmt(fold_expr(s.cond), fold_block(s.then_body), fold_block(s.else_body))
+
+def _fold_while(s: WhileStmt) -> Stmt:
+    return WhileStmt(fold_expr(s.cond), fold_block(s.body))
+
+def _fold_spell_def(s: SpellDef) -> Stmt:
+    return SpellDef(s.name, s.params, fold_block(s.body))
+
+def _fold_return(s: ReturnStmt) -> Stmt:
+    return ReturnStmt(fold_expr(s.expr) if s.expr is not None else None)
+
+def _fold_in_region(s: InRegion) -> Stmt:
+    return InRegion(s.region, fold_block(s.body))
+
+_FOLD_STMT: Dict[type, Callable[[Any], Stmt]] = {
+    Inscribe: _fold_inscribe,
+    Proclaim: _fold_proclaim,
+    ExprStmt: _fold_expr_stmt,
+    IfStmt: _fold_if,
+    WhileStmt: _fold_while,
+    SpellDef: _fold_spell_def,
+    ReturnStmt: _fold_return,
+    InRegion: _fold_in_region,
+}
+
+def fold_program(program: List[Stmt]) -> List[Stmt]:
+    return fold_block(program)
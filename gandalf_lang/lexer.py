@@ -1,6 +1,11 @@
 from __future__ import annotations
-from typing import List
-from .tokens import Token, LexError
+import re
+import sys
+from array import array
+from typing import Any, List
+from .tokens import (
+    TokenStream, LexError, TOKEN_KINDS, TK_EOF, TK_NEWLINE, TK_IDENT, TK_NUMBER, TK_STRING,
+)
 
 KEYWORDS = {
     # original
@@ -75,115 +80,109 @@ ONE_CHAR = {
     ":": "COLON",
 }
 
-def tokenize(src: str) -> List[Token]:
-    tokens: List[Token] = []
-    i = 0
-    line, col = 1, 1
+OPERATORS = {**TWO_CHAR_OPS, **ONE_CHAR}
+
+# Token kind of every fixed spelling (keywords, aliases and operators); any
+# other word is an IDENT. One table lookup classifies the commonest tokens.
+TOKEN_TYPES = {text: TOKEN_KINDS[name] for text, name in {**OPERATORS, **KEYWORDS}.items()}
+
+# One alternation over every token shape, so the regex engine does the
+# scanning and Python dispatches once per token. Leading blanks and a trailing
+# comment are folded into the same match; the greedy prefix can never backtrack
+# because the alternation always matches something (END at end of input).
+TOKEN_RE = re.compile(r"""
+    [^\S\n]* (?:\#[^\n]*)?
+    (?:
+        ([^\W\d]\w*|==|!=|<=|>=|[-+*/()\[\]{}<>=,:])  # 1 word / operator
+      | (\n)                                      # 2 NEWLINE
+      | (\d+(?:\.\d*)?)                           # 3 NUMBER
+      | ("(?:[^"\\\n]|\\[\s\S])*")                # 4 STRING
+      | (\Z)                                      # 5 END
+      | (.)                                       # 6 ERROR
+    )
+""", re.VERBOSE)
+T_WORD, T_NEWLINE, T_NUMBER, T_STRING, T_END, T_ERROR = range(1, 7)
+
+ESCAPE_RE = re.compile(r"\\([\s\S])")
+
+def _unescape(m: "re.Match[str]") -> str:
+    c = m.group(1)
+    return "\n" if c == "n" else c
+
+def _string_error(src: str, start: int, line: int, line_start: int) -> LexError:
+    # cold path: re-scan an unterminated literal to report where it broke
+    i = start + 1
     n = len(src)
-
-    def peek(k: int = 0) -> str:
-        return src[i + k] if i + k < n else "\0"
-
     while i < n:
-        ch = src[i]
-
-        if ch == "\n":
-            tokens.append(Token("NEWLINE", "\n", line, col))
-            i += 1
-            line += 1
-            col = 1
-            continue
-
-        if ch.isspace():
-            i += 1
-            col += 1
-            continue
-
-        if ch == "#":
-            while i < n and src[i] != "\n":
-                i += 1
-                col += 1
-            continue
-
-        start_line, start_col = line, col
-
-        op2 = ch + peek(1)
-        if op2 in TWO_CHAR_OPS:
-            tokens.append(Token(TWO_CHAR_OPS[op2], op2, start_line, start_col))
+        c = src[i]
+        if c == "\\":
+            if i + 1 >= n:
+                return LexError(f"Unterminated escape in string (line {line}, col {i - line_start + 1})")
             i += 2
-            col += 2
-            continue
-
-        if ch in ONE_CHAR:
-            tokens.append(Token(ONE_CHAR[ch], ch, start_line, start_col))
-            i += 1
-            col += 1
             continue
-
-        if ch == '"':
-            i += 1
-            col += 1
-            out = []
-            while i < n:
-                c = src[i]
-                if c == '"':
-                    i += 1
-                    col += 1
-                    tokens.append(Token("STRING", "".join(out), start_line, start_col))
-                    break
-                if c == "\\":
-                    if i + 1 >= n:
-                        raise LexError(f"Unterminated escape in string (line {line}, col {col})")
-                    nxt = src[i + 1]
-                    if nxt == "n":
-                        out.append("\n")
-                    elif nxt == '"':
-                        out.append('"')
-                    elif nxt == "\\":
-                        out.append("\\")
-                    else:
-                        out.append(nxt)
-                    i += 2
-                    col += 2
-                    continue
-                if c == "\n":
-                    raise LexError(f"Unterminated string literal (line {line}, col {col})")
-                out.append(c)
-                i += 1
-                col += 1
+        if c == "\n":
+            return LexError(f"Unterminated string literal (line {line}, col {i - line_start + 1})")
+        i += 1
+    return LexError(f"Unterminated string literal (line {line}, col {start - line_start + 1})")
+
+def tokenize(src: str) -> TokenStream:
+    types: List[int] = []
+    values: List[Any] = []
+    lines = array("I")
+    cols = array("I")
+    add_type = types.append
+    add_value = values.append
+    add_line = lines.append
+    add_col = cols.append
+    fixed = TOKEN_TYPES.get
+    intern = sys.intern
+    line = 1
+    line_start = 0  # offset of the first character of the current line
+
+    for m in TOKEN_RE.finditer(src):
+        kind = m.lastindex
+        start = m.start(kind)
+
+        if kind == T_WORD:
+            text = m.group(kind)
+            typ = fixed(text)
+            if typ is None:
+                # identifiers are interned so later name lookups compare by identity
+                add_type(TK_IDENT)
+                add_value(intern(text))
             else:
-                raise LexError(f"Unterminated string literal (line {start_line}, col {start_col})")
-            continue
-
-        if ch.isdigit():
-            j = i
-            has_dot = False
-            while j < n and (src[j].isdigit() or (src[j] == "." and not has_dot)):
-                if src[j] == ".":
-                    has_dot = True
-                j += 1
-            num_str = src[i:j]
-            try:
-                value = float(num_str) if "." in num_str else int(num_str)
-            except ValueError:
-                raise LexError(f"Invalid number '{num_str}' (line {start_line}, col {start_col})")
-            tokens.append(Token("NUMBER", value, start_line, start_col))
-            col += (j - i)
-            i = j
+                add_type(typ)
+                add_value(text)
+        elif kind == T_NEWLINE:
+            add_type(TK_NEWLINE)
+            add_value("\n")
+            add_line(line)
+            add_col(start - line_start + 1)
+            line += 1
+            line_start = start + 1
             continue
-
-        if ch.isalpha() or ch == "_":
-            j = i
-            while j < n and (src[j].isalnum() or src[j] == "_"):
-                j += 1
-            word = src[i:j]
-            typ = KEYWORDS.get(word, "IDENT")
-            tokens.append(Token(typ, word, start_line, start_col))
-            col += (j - i)
-            i = j
+        elif kind == T_NUMBER:
+            text = m.group(kind)
+            add_type(TK_NUMBER)
+            add_value(float(text) if "." in text else int(text))
+        elif kind == T_STRING:
+            body = m.group(kind)[1:-1]
+            if "\\" in body:
+                body = ESCAPE_RE.sub(_unescape, body)
+            add_type(TK_STRING)
+            add_value(body)
+        elif kind == T_ERROR:
+            ch = m.group(kind)
+            if ch == '"':
+                raise _string_error(src, start, line, line_start)
+            raise LexError(f"Unexpected character '{ch}' (line {line}, col {start - line_start + 1})")
+        else:
             continue
-
-        raise LexError(f"Unexpected character '{ch}' (line {line}, col {col})")
-
-    tokens.append(Token("EOF", None, line, col))
-    return tokens
+        add_line(line)
+        add_col(start - line_start + 1)
+
+    add_type(TK_EOF)
+    add_value(None)
+    add_line(line)
+    add_col(len(src) - line_start + 1)
+    return TokenStream(types, values, lines, cols)
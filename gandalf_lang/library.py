@@ -0,0 +1,18 @@
+from __future__ import annotations
+import math
+from typing import Any, Callable, Dict
+
+# -------------------------
+# SAFE invoke
+# -------------------------
+# Plain Python callables reachable through `invoke "..."`. These are pure
+# functions of their arguments; the Mordor/Ring restriction is enforced by the
+# interpreter, not here.
+SAFE_INVOKE: Dict[str, Callable[..., Any]] = {
+    "math.sqrt": math.sqrt,
+    "math.floor": math.floor,
+    "math.ceil": math.ceil,
+    "math.pow": math.pow,
+    "abs": abs,
+    "len": len,
+}
@@ -1,285 +1,421 @@
 from __future__ import annotations
-from typing import List, Set, Tuple
-from .tokens import Token, ParseError
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+from .tokens import (
+    TokenStream, ParseError, TOKEN_NAMES,
+    TK_EOF, TK_NEWLINE, TK_IDENT, TK_NUMBER, TK_STRING,
+    TK_INSCRIBE, TK_PROCLAIM, TK_IF, TK_THEN, TK_ELSE, TK_WHILE, TK_DO, TK_END, TK_SPELL,
+    TK_RETURN, TK_INVOKE, TK_WITH, TK_IN, TK_BE, TK_CLAIM, TK_BEAR, TK_UNBEAR, TK_DESTROY,
+    TK_TRUE, TK_FALSE, TK_NIL,
+    TK_EQEQ, TK_NE, TK_LE, TK_GE, TK_PLUS, TK_MINUS, TK_STAR, TK_SLASH, TK_LPAREN, TK_RPAREN,
+    TK_LBRACK, TK_RBRACK, TK_LBRACE, TK_RBRACE, TK_LT, TK_GT, TK_EQ, TK_COMMA, TK_COLON,
+)
+from .library import SAFE_INVOKE
 from .ast_nodes import (
-    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, Call, Invoke,
+    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, ChainOp, Call, Invoke,
     ListLit, DictLit, Index,
     Stmt, Inscribe, Proclaim, ExprStmt, IfStmt, WhileStmt, SpellDef, ReturnStmt,
     InRegion, BeRace, ArtifactAction
 )
 
+# Binding power of each binary operator, loosest first; all of them are
+# left-associative. Any other token kind ends a binary expression.
+BINARY_PRECEDENCE: Dict[int, int] = {
+    TK_EQEQ: 1, TK_NE: 1,
+    TK_LT: 2, TK_GT: 2, TK_LE: 2, TK_GE: 2,
+    TK_PLUS: 3, TK_MINUS: 3,
+    TK_STAR: 4, TK_SLASH: 4,
+}
+ATOM_KINDS = frozenset({TK_IDENT, TK_NUMBER, TK_STRING})
+# After one of ATOM_KINDS, either of these makes it a call or an index.
+POSTFIX_STARTS = frozenset({TK_LBRACK, TK_LPAREN})
+# a bare `return` is followed by one of these
+RETURN_ENDS = frozenset({TK_NEWLINE, TK_END, TK_ELSE, TK_EOF})
+
+BLOCK_END = frozenset({TK_END})
+THEN_END = frozenset({TK_ELSE, TK_END})
+
+# Literal nodes are immutable, so common ones are shared instead of rebuilt at
+# every occurrence: small ints and short strings (including dict keys) go
+# through these caches, and true/false/nil have one node each.
+_NUM_CACHE: Dict[int, Num] = {}
+_STR_CACHE: Dict[str, Str] = {}
+STR_CACHE_MAX_LEN = 16
+STR_CACHE_SIZE = 4096
+TRUE_NODE = BoolLit(True)
+FALSE_NODE = BoolLit(False)
+NIL_NODE = NilLit()
+
+def _num_node(value: Any) -> Num:
+    if type(value) is not int:
+        return Num(value)
+    node = _NUM_CACHE.get(value)
+    if node is None:
+        node = Num(value)
+        if -128 <= value <= 1024:
+            _NUM_CACHE[value] = node
+    return node
+
+def _str_node(value: str) -> Str:
+    node = _STR_CACHE.get(value)
+    if node is None:
+        node = Str(value)
+        if len(value) <= STR_CACHE_MAX_LEN and len(_STR_CACHE) < STR_CACHE_SIZE:
+            _STR_CACHE[value] = node
+    return node
+
+def _binary(kind: int, operands: List[Expr]) -> Expr:
+    if len(operands) == 2:
+        return BinOp(operands[0], TOKEN_NAMES[kind], operands[1])
+    return ChainOp(TOKEN_NAMES[kind], operands)
+
 class Parser:
-    def __init__(self, tokens: List[Token]):
-        self.toks = tokens
-        self.i = 0
+    def __init__(self, stream: TokenStream):
+        # token i is (types[i], values[i]): the hot checks are one index and an
+        # int compare, with no token objects at all
+        self.types: List[int] = stream.types
+        self.values: List[Any] = stream.values
+        self.lines = stream.lines
+        self.cols = stream.cols
+        self.i: int = 0
+
+    def advance(self) -> Any:
+        # returns the value of the token stepped past
+        i = self.i
+        if self.types[i] != TK_EOF:
+            self.i = i + 1
+        return self.values[i]
 
-    def peek(self) -> Token:
-        return self.toks[self.i]
+    def error(self, msg: str) -> None:
+        self.error_at(self.i, msg)
 
-    def at(self, typ: str) -> bool:
-        return self.peek().type == typ
+    def error_at(self, i: int, msg: str) -> None:
+        raise ParseError(f"{msg} (line {self.lines[i]}, col {self.cols[i]})")
 
-    def advance(self) -> Token:
-        t = self.peek()
-        if t.type != "EOF":
-            self.i += 1
-        return t
+    def expect(self, typ: int) -> Any:
+        i = self.i
+        if self.types[i] == typ:
+            if typ != TK_EOF:
+                self.i = i + 1
+            return self.values[i]
+        self._expect_fail(typ)
 
-    def error(self, msg: str) -> None:
-        t = self.peek()
-        raise ParseError(f"{msg} (line {t.line}, col {t.col})")
-
-    def expect(self, typ: str) -> Token:
-        t = self.peek()
-        if t.type != typ:
-            self.error(f"Expected {typ}, got {t.type}")
-        return self.advance()
+    # Error paths live in their own methods so the hot ones above stay small.
+    def _expect_fail(self, typ: int) -> None:
+        self.error(f"Expected {TOKEN_NAMES[typ]}, got {TOKEN_NAMES[self.types[self.i]]}")
 
-    def skip_newlines(self) -> None:
-        while self.at("NEWLINE"):
-            self.advance()
+    def _unexpected_token(self) -> None:
+        self.error(f"Unexpected token in expression: {TOKEN_NAMES[self.types[self.i]]}")
 
+    # The statement loops keep the position in a local between statements (and
+    # skip blank lines inline), syncing self.i only around parse_stmt.
     def parse_program(self) -> List[Stmt]:
         stmts: List[Stmt] = []
-        self.skip_newlines()
-        while not self.at("EOF"):
-            stmts.append(self.parse_stmt())
-            self.skip_newlines()
+        types = self.types
+        parse_stmt = self.parse_stmt
+        i = self.i
+        while types[i] == TK_NEWLINE:
+            i += 1
+        while types[i] != TK_EOF:
+            self.i = i
+            stmts.append(parse_stmt())
+            i = self.i
+            while types[i] == TK_NEWLINE:
+                i += 1
+        self.i = i
         return stmts
 
-    def parse_block_until(self, end_tokens: Set[str]) -> List[Stmt]:
+    def parse_block_until(self, end_tokens: FrozenSet[int]) -> List[Stmt]:
         body: List[Stmt] = []
-        self.skip_newlines()
-        while self.peek().type not in end_tokens:
-            if self.at("EOF"):
-                self.error(f"Unexpected EOF; expected one of {sorted(end_tokens)}")
-            body.append(self.parse_stmt())
-            self.skip_newlines()
+        types = self.types
+        parse_stmt = self.parse_stmt
+        i = self.i
+        while types[i] == TK_NEWLINE:
+            i += 1
+        self.i = i
+        while types[i] not in end_tokens:
+            if types[i] == TK_EOF:
+                names = sorted(TOKEN_NAMES[k] for k in end_tokens)
+                self.error(f"Unexpected EOF; expected one of {names}")
+            body.append(parse_stmt())
+            i = self.i
+            while types[i] == TK_NEWLINE:
+                i += 1
+            self.i = i
         return body
 
+    # ---- Statements ----
+    # Each handler is entered on its keyword, which it steps past itself.
     def parse_stmt(self) -> Stmt:
-        t = self.peek().type
-
-        if t == "INSCRIBE":
-            self.advance()
-            name = self.expect("IDENT").value
-            self.expect("EQ")
-            expr = self.parse_expr()
-            return Inscribe(name, expr)
-
-        if t == "PROCLAIM":
-            self.advance()
-            expr = self.parse_expr()
-            return Proclaim(expr)
-
-        if t == "BE":
-            self.advance()
-            race = self.expect("IDENT").value
-            return BeRace(race)
-
-        if t == "IN":
-            self.advance()
-            region = self.expect("IDENT").value
-            self.expect("DO")
-            body = self.parse_block_until({"END"})
-            self.expect("END")
-            return InRegion(region, body)
-
-        if t in ("CLAIM", "BEAR", "UNBEAR", "DESTROY"):
-            action = self.advance().type
-            artifact = self.expect("IDENT").value
-            return ArtifactAction(action, artifact)
-
-        if t == "IF":
-            self.advance()
-            cond = self.parse_expr()
-            self.expect("THEN")
-            then_body = self.parse_block_until({"ELSE", "END"})
-            else_body: List[Stmt] = []
-            if self.at("ELSE"):
-                self.advance()
-                else_body = self.parse_block_until({"END"})
-            self.expect("END")
-            return IfStmt(cond, then_body, else_body)
-
-        if t == "WHILE":
-            self.advance()
-            cond = self.parse_expr()
-            self.expect("DO")
-            body = self.parse_block_until({"END"})
-            self.expect("END")
-            return WhileStmt(cond, body)
-
-        if t == "SPELL":
-            self.advance()
-            name = self.expect("IDENT").value
-            self.expect("LPAREN")
-            params: List[str] = []
-            if not self.at("RPAREN"):
-                params.append(self.expect("IDENT").value)
-                while self.at("COMMA"):
-                    self.advance()
-                    params.append(self.expect("IDENT").value)
-            self.expect("RPAREN")
-            self.expect("DO")
-            body = self.parse_block_until({"END"})
-            self.expect("END")
-            return SpellDef(name, params, body)
-
-        if t == "RETURN":
-            self.advance()
-            if self.at("NEWLINE") or self.at("END") or self.at("ELSE") or self.at("EOF"):
-                return ReturnStmt(None)
-            expr = self.parse_expr()
-            return ReturnStmt(expr)
-
-        # NEW: expression as statement (e.g. push(xs, 1))
+        handler = _STMT_PARSERS.get(self.types[self.i])
+        if handler is None:
+            # NEW: expression as statement (e.g. push(xs, 1))
+            return ExprStmt(self.parse_expr())
+        return handler(self)
+
+    def _inscribe(self) -> Stmt:
+        self.i += 1
+        name = self.expect(TK_IDENT)
+        self.expect(TK_EQ)
         expr = self.parse_expr()
-        return ExprStmt(expr)
+        return Inscribe(name, expr)
+
+    def _proclaim(self) -> Stmt:
+        self.i += 1
+        return Proclaim(self.parse_expr())
+
+    def _be(self) -> Stmt:
+        self.i += 1
+        race = self.expect(TK_IDENT)
+        return BeRace(race)
+
+    def _in(self) -> Stmt:
+        self.i += 1
+        region = self.expect(TK_IDENT)
+        self.expect(TK_DO)
+        body = self.parse_block_until(BLOCK_END)
+        self.expect(TK_END)
+        return InRegion(region, body)
+
+    def _artifact(self) -> Stmt:
+        action = TOKEN_NAMES[self.types[self.i]]
+        self.i += 1
+        artifact = self.expect(TK_IDENT)
+        return ArtifactAction(action, artifact)
+
+    def _if(self) -> Stmt:
+        self.i += 1
+        cond = self.parse_expr()
+        self.expect(TK_THEN)
+        then_body = self.parse_block_until(THEN_END)
+        else_body: List[Stmt] = []
+        if self.types[self.i] == TK_ELSE:
+            self.i += 1
+            else_body = self.parse_block_until(BLOCK_END)
+        self.expect(TK_END)
+        return IfStmt(cond, then_body, else_body)
+
+    def _while(self) -> Stmt:
+        self.i += 1
+        cond = self.parse_expr()
+        self.expect(TK_DO)
+        body = self.parse_block_until(BLOCK_END)
+        self.expect(TK_END)
+        return WhileStmt(cond, body)
+
+    def _spell(self) -> Stmt:
+        self.i += 1
+        name = self.expect(TK_IDENT)
+        self.expect(TK_LPAREN)
+        params: List[str] = []
+        types = self.types
+        if types[self.i] != TK_RPAREN:
+            params.append(self.expect(TK_IDENT))
+            while types[self.i] == TK_COMMA:
+                self.i += 1
+                params.append(self.expect(TK_IDENT))
+        self.expect(TK_RPAREN)
+        self.expect(TK_DO)
+        body = self.parse_block_until(BLOCK_END)
+        self.expect(TK_END)
+        return SpellDef(name, params, body)
+
+    def _return(self) -> Stmt:
+        self.i += 1
+        if self.types[self.i] in RETURN_ENDS:
+            return ReturnStmt(None)
+        return ReturnStmt(self.parse_expr())
 
     # ---- Expressions ----
-    def parse_expr(self) -> Expr:
-        return self.parse_equality()
-
-    def parse_equality(self) -> Expr:
-        expr = self.parse_comparison()
-        while self.at("EQEQ") or self.at("NE"):
-            op = self.advance().type
-            right = self.parse_comparison()
-            expr = BinOp(expr, op, right)
-        return expr
-
-    def parse_comparison(self) -> Expr:
-        expr = self.parse_term()
-        while self.at("LT") or self.at("GT") or self.at("LE") or self.at("GE"):
-            op = self.advance().type
-            right = self.parse_term()
-            expr = BinOp(expr, op, right)
-        return expr
-
-    def parse_term(self) -> Expr:
-        expr = self.parse_factor()
-        while self.at("PLUS") or self.at("MINUS"):
-            op = self.advance().type
-            right = self.parse_factor()
-            expr = BinOp(expr, op, right)
-        return expr
-
-    def parse_factor(self) -> Expr:
-        expr = self.parse_unary()
-        while self.at("STAR") or self.at("SLASH"):
-            op = self.advance().type
-            right = self.parse_unary()
-            expr = BinOp(expr, op, right)
-        return expr
+    # Precedence climbing over BINARY_PRECEDENCE: one frame per operand instead
+    # of one per precedence level. A matched operator is never EOF, so stepping
+    # past it is just `self.i += 1`. Consecutive uses of one operator collect
+    # into a single ChainOp rather than a BinOp per operator.
+    def parse_expr(self, min_prec: int = 1) -> Expr:
+        types = self.types
+        i = self.i
+        # a plain number, string or name (the commonest operand) is built here,
+        # skipping the unary/postfix/primary chain; none of them is EOF, so
+        # there is always a next token to look at
+        kind = types[i]
+        if kind in ATOM_KINDS and types[i + 1] not in POSTFIX_STARTS:
+            self.i = i + 1
+            value = self.values[i]
+            if kind == TK_IDENT:
+                expr: Expr = Var(value)
+            elif kind == TK_NUMBER:
+                expr = _num_node(value)
+            else:
+                expr = _str_node(value)
+            # the common lone operand: nothing binds to it
+            if types[i + 1] not in BINARY_PRECEDENCE:
+                return expr
+        else:
+            expr = self.parse_unary()
+        prec_of = BINARY_PRECEDENCE.get
+        run: List[Expr] = []  # operands of the current run of run_op
+        run_op = TK_EOF
+        while True:
+            op = types[self.i]
+            prec = prec_of(op, 0)
+            if prec < min_prec:
+                break
+            self.i += 1
+            right = self.parse_expr(prec + 1)
+            if op == run_op:
+                run.append(right)
+            else:
+                if run:
+                    expr = _binary(run_op, run)
+                run = [expr, right]
+                run_op = op
+        return _binary(run_op, run) if run else expr
 
     def parse_unary(self) -> Expr:
-        if self.at("MINUS"):
-            self.advance()
-            return UnaryOp("NEG", self.parse_unary())
+        if self.types[self.i] == TK_MINUS:
+            self.i += 1
+            operand = self.parse_unary()
+            # fold negative literals (-1, - -2.5) straight into the constant
+            if isinstance(operand, Num):
+                return Num(-operand.value)
+            return UnaryOp("NEG", operand)
         return self.parse_postfix()
 
     def parse_postfix(self) -> Expr:
+        types = self.types
         expr = self.parse_primary()
-        while self.at("LBRACK"):
-            self.advance()
+        while types[self.i] == TK_LBRACK:
+            self.i += 1
             idx = self.parse_expr()
-            self.expect("RBRACK")
+            self.expect(TK_RBRACK)
             expr = Index(expr, idx)
         return expr
 
+    # Like the statement handlers, each primary handler steps past its first
+    # token (never EOF) itself.
     def parse_primary(self) -> Expr:
-        t = self.peek()
-
-        if t.type == "NUMBER":
-            self.advance()
-            return Num(t.value)
-
-        if t.type == "STRING":
-            self.advance()
-            return Str(t.value)
-
-        if t.type == "TRUE":
-            self.advance()
-            return BoolLit(True)
-
-        if t.type == "FALSE":
-            self.advance()
-            return BoolLit(False)
-
-        if t.type == "NIL":
-            self.advance()
-            return NilLit()
-
-        if t.type == "INVOKE":
-            self.advance()
-            target_tok = self.expect("STRING")
-            args: List[Expr] = []
-            if self.at("WITH"):
-                self.advance()
-                args.append(self.parse_expr())
-                while self.at("COMMA"):
-                    self.advance()
-                    args.append(self.parse_expr())
-            return Invoke(target_tok.value, args)
-
-        if t.type == "LBRACK":
-            self.advance()
-            items: List[Expr] = []
-            if not self.at("RBRACK"):
-                items.append(self.parse_expr())
-                while self.at("COMMA"):
-                    self.advance()
-                    items.append(self.parse_expr())
-            self.expect("RBRACK")
-            return ListLit(items)
-
-        if t.type == "LBRACE":
-            self.advance()
-            items: List[Tuple[Expr, Expr]] = []
-            if not self.at("RBRACE"):
+        handler = _PRIMARY_PARSERS.get(self.types[self.i])
+        if handler is None:
+            self._unexpected_token()
+        return handler(self)
+
+    def _name(self) -> Expr:
+        name = self.values[self.i]
+        self.i += 1
+        if self.types[self.i] == TK_LPAREN:
+            self.i += 1
+            args = self.parse_expr_list() if self.types[self.i] != TK_RPAREN else []
+            self.expect(TK_RPAREN)
+            return Call(name, args)
+        return Var(name)
+
+    def _number(self) -> Expr:
+        value = self.values[self.i]
+        self.i += 1
+        return _num_node(value)
+
+    def _string(self) -> Expr:
+        value = self.values[self.i]
+        self.i += 1
+        return _str_node(value)
+
+    def _true(self) -> Expr:
+        self.i += 1
+        return TRUE_NODE
+
+    def _false(self) -> Expr:
+        self.i += 1
+        return FALSE_NODE
+
+    def _nil(self) -> Expr:
+        self.i += 1
+        return NIL_NODE
+
+    def _invoke(self) -> Expr:
+        self.i += 1
+        target = self.expect(TK_STRING)
+        # reject unknown targets up front; the compiler binds the function itself
+        if target not in SAFE_INVOKE:
+            self.error_at(
+                self.i - 1,
+                f"Forbidden spell: {target}. Use one of: {', '.join(sorted(SAFE_INVOKE.keys()))}",
+            )
+        args: List[Expr] = []
+        if self.types[self.i] == TK_WITH:
+            self.i += 1
+            args = self.parse_expr_list()
+        return Invoke(target, args)
+
+    def _list(self) -> Expr:
+        self.i += 1
+        items = self.parse_expr_list() if self.types[self.i] != TK_RBRACK else []
+        self.expect(TK_RBRACK)
+        return ListLit(items)
+
+    def _dict(self) -> Expr:
+        self.i += 1
+        items: List[Tuple[Expr, Expr]] = []
+        types = self.types
+        if types[self.i] != TK_RBRACE:
+            k = self.parse_dict_key()
+            self.expect(TK_COLON)
+            v = self.parse_expr()
+            items.append((k, v))
+            while types[self.i] == TK_COMMA:
+                self.i += 1
                 k = self.parse_dict_key()
-                self.expect("COLON")
+                self.expect(TK_COLON)
                 v = self.parse_expr()
                 items.append((k, v))
-                while self.at("COMMA"):
-                    self.advance()
-                    k = self.parse_dict_key()
-                    self.expect("COLON")
-                    v = self.parse_expr()
-                    items.append((k, v))
-            self.expect("RBRACE")
-            return DictLit(items)
-
-        if t.type == "IDENT":
-            name = self.advance().value
-            if self.at("LPAREN"):
-                self.advance()
-                args: List[Expr] = []
-                if not self.at("RPAREN"):
-                    args.append(self.parse_expr())
-                    while self.at("COMMA"):
-                        self.advance()
-                        args.append(self.parse_expr())
-                self.expect("RPAREN")
-                return Call(name, args)
-            return Var(name)
-
-        if t.type == "LPAREN":
-            self.advance()
-            expr = self.parse_expr()
-            self.expect("RPAREN")
-            return expr
-
-        self.error(f"Unexpected token in expression: {t.type}")
+        self.expect(TK_RBRACE)
+        return DictLit(items)
+
+    def _group(self) -> Expr:
+        self.i += 1
+        expr = self.parse_expr()
+        self.expect(TK_RPAREN)
+        return expr
+
+    # One or more comma-separated expressions.
+    def parse_expr_list(self) -> List[Expr]:
+        types = self.types
+        parse_expr = self.parse_expr
+        items = [parse_expr()]
+        while types[self.i] == TK_COMMA:
+            self.i += 1
+            items.append(parse_expr())
+        return items
 
     def parse_dict_key(self) -> Expr:
-        t = self.peek()
-        if t.type == "STRING":
-            self.advance()
-            return Str(t.value)
-        if t.type == "IDENT":
-            self.advance()
-            return Str(t.value)
+        if self.types[self.i] in (TK_STRING, TK_IDENT):
+            return _str_node(self.advance())
         self.error("Dict key must be STRING or IDENT")
         raise AssertionError("unreachable")
+
+# One dict lookup on the token kind instead of an if ladder.
+_STMT_PARSERS: Dict[int, Callable[[Parser], Stmt]] = {
+    TK_INSCRIBE: Parser._inscribe,
+    TK_PROCLAIM: Parser._proclaim,
+    TK_BE: Parser._be,
+    TK_IN: Parser._in,
+    TK_CLAIM: Parser._artifact,
+    TK_BEAR: Parser._artifact,
+    TK_UNBEAR: Parser._artifact,
+    TK_DESTROY: Parser._artifact,
+    TK_IF: Parser._if,
+    TK_WHILE: Parser._while,
+    TK_SPELL: Parser._spell,
+    TK_RETURN: Parser._return,
+}
+
+_PRIMARY_PARSERS: Dict[int, Callable[[Parser], Expr]] = {
+    TK_IDENT: Parser._name,
+    TK_NUMBER: Parser._number,
+    TK_STRING: Parser._string,
+    TK_TRUE: Parser._true,
+    TK_FALSE: Parser._false,
+    TK_NIL: Parser._nil,
+    TK_INVOKE: Parser._invoke,
+    TK_LBRACK: Parser._list,
+    TK_LBRACE: Parser._dict,
+    TK_LPAREN: Parser._group,
+}
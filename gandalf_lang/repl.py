@@ -1,31 +1,39 @@
 from __future__ import annotations
+import re
+from .lexer import KEYWORDS
 from .runtime import Interpreter
 from .tokens import GandalfError
 
-def needs_more_lines(buffer: str) -> bool:
-    lower = buffer.lower()
-
-    def count_word(w: str) -> int:
-        return lower.count(f" {w} ") + lower.count(f"\n{w} ") + (1 if lower.lstrip().startswith(w + " ") else 0)
+# Keywords (and their aliases) that open a block closed by `end`.
+BLOCK_OPENERS = frozenset(w for w, t in KEYWORDS.items() if t in ("IF", "WHILE", "SPELL", "IN"))
+BLOCK_CLOSERS = frozenset(w for w, t in KEYWORDS.items() if t == "END")
+
+# Words, plus the strings and comments whose words must not be counted. A
+# string or comment stops at the end of its line, like in the lexer, so a
+# whole buffer can be scanned in one pass.
+WORD_RE = re.compile(r'"(?:[^"\\\n]|\\[^\n])*"?|#.*|[^\W\d]\w*')
+
+def line_depth(text: str) -> int:
+    """Net number of blocks opened by a line (or several lines) of input."""
+    delta = 0
+    for m in WORD_RE.finditer(text):
+        word = m.group()
+        if word in BLOCK_OPENERS:
+            delta += 1
+        elif word in BLOCK_CLOSERS:
+            delta -= 1
+    return delta
 
-    opens = 0
-    opens += count_word("if")
-    opens += count_word("when")
-    opens += count_word("while")
-    opens += count_word("endure")
-    opens += count_word("spell")
-    opens += count_word("weave")
-    opens += count_word("in")
-    opens += count_word("within")
-
-    ends = lower.count("end")
-    return opens > ends
+def needs_more_lines(buffer: str) -> bool:
+    return line_depth(buffer) > 0
 
 def repl() -> None:
     itp = Interpreter()
     print("GandalfLang REPL — Speak, friend, and enter.")
     print("Type Ctrl+C or Ctrl+D to leave Middle-earth.")
     buf_lines: list[str] = []
+    # running block depth of buf_lines, so each new line is scanned once
+    depth = 0
 
     while True:
         try:
@@ -36,10 +44,10 @@ def repl() -> None:
             return
 
         buf_lines.append(line)
-        src = "\n".join(buf_lines)
-
-        if needs_more_lines("\n" + src + "\n"):
+        depth += line_depth(line)
+        if depth > 0:
             continue
+        src = "\n".join(buf_lines)
 
         try:
             itp.run(src)
@@ -49,3 +57,4 @@ def repl() -> None:
             print(f"Fizzle (unexpected): {e}")
 
         buf_lines.clear()
+        depth = 0
@@ -1,73 +1,48 @@
 from __future__ import annotations
+import sys
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .tokens import RuntimeError
-from .lexer import tokenize
-from .parser import Parser
-from .ast_nodes import (
-    # expr
-    Expr, Num, Str, BoolLit, NilLit, Var, UnaryOp, BinOp, Call, Invoke,
-    ListLit, DictLit, Index,
-    # stmt
-    Stmt, Inscribe, Proclaim, ExprStmt, IfStmt, WhileStmt, SpellDef, ReturnStmt,
-    InRegion, BeRace, ArtifactAction
+from .cache import load_or_compile
+from .codegen import load_factory
+from .compiler import (
+    Code, compile_source, PURE_BUILTINS,
+    LOAD_CONST, LOAD_GLOBAL, STORE_GLOBAL, LOAD_FAST, STORE_FAST, POP_TOP,
+    JUMP, JUMP_IF_FALSE,
+    BINARY_ADD, BINARY_SUB, BINARY_MUL, BINARY_DIV, BINARY_ADD_NUM, BINARY_ADD_STR, BINARY_CONCAT,
+    COMPARE_LT, COMPARE_GT, COMPARE_LE, COMPARE_GE, COMPARE_EQ, COMPARE_NE,
+    UNARY_NEG, BUILD_LIST, BUILD_DICT, INDEX, CALL, INVOKE, RETURN, PROCLAIM,
+    PUSH_REGION, POP_REGION, SET_RACE, ARTIFACT, DEF_SPELL, CHECK_INVOKE, BIND_CALL,
+    CALL_BOUND, INVOKE1, RUN_PYTHON,
 )
 
 # -------------------------
 # Helpers
 # -------------------------
 def is_number(x: Any) -> bool:
-    return type(x) in (int, float)
-
-def truthy(x: Any) -> bool:
-    return bool(x)
-
-class ReturnSignal(Exception):
-    def __init__(self, value: Any):
-        self.value = value
-
-class Env:
-    def __init__(self, parent: Optional["Env"] = None):
-        self.parent = parent
-        self.values: Dict[str, Any] = {}
-
-    def get(self, name: str) -> Any:
-        if name in self.values:
-            return self.values[name]
-        if self.parent:
-            return self.parent.get(name)
-        raise RuntimeError(f"Unknown name: {name}")
-
-    def set_local(self, name: str, value: Any) -> None:
-        self.values[name] = value
-
-    def set(self, name: str, value: Any) -> None:
-        if name in self.values:
-            self.values[name] = value
-            return
-        if self.parent:
-            self.parent.set(name, value)
-            return
-        self.values[name] = value
+    # identity tests: `type(x) in (int, float)` builds the tuple on every call
+    t = type(x)
+    return t is int or t is float
 
 @dataclass(frozen=True)
 class Spell:
+    # slotted like the AST nodes: call() reads these on every spell call
+    __slots__ = ("params", "code", "memo", "fn")
     params: List[str]
-    body: List[Stmt]
+    code: Code
+    # args -> result cache, only for spells the compiler proved pure
+    memo: Optional[Dict[Any, Any]]
+    # the body as a Python function (from Code.pysrc); None runs the bytecode
+    fn: Optional[Callable[..., Any]]
 
-# -------------------------
-# SAFE invoke
-# -------------------------
-import math
-SAFE_INVOKE: Dict[str, Callable[..., Any]] = {
-    "math.sqrt": math.sqrt,
-    "math.floor": math.floor,
-    "math.ceil": math.ceil,
-    "math.pow": math.pow,
-    "abs": abs,
-    "len": len,
-}
+# memoized results must be immutable, or callers would share one list/dict
+MEMO_RESULT_TYPES = (int, float, str, bool, type(None))
+MEMO_LIMIT = 10000
+_MISS = object()
+
+# call() without a spell from bind_call()
+_UNBOUND = object()
 
 # -------------------------
 # LOTR built-ins base
@@ -92,16 +67,81 @@ BUILTINS_BASE: Dict[str, Callable[..., Any]] = {
     "precious": _ring_name,
 }
 
+RACES = frozenset({"man", "elf", "dwarf", "hobbit", "wizard", "orc"})
+ARTIFACTS = frozenset({"ring", "mithril", "phial"})
+
+# Region and race flavour, looked up instead of tested branch by branch. Each
+# "{}" takes the value; a missing key gets the plain form.
+
+# (region, bearing the unbroken Ring) -> lines printed by proclaim
+PROCLAIM_FORMS: Dict[Tuple[str, bool], Tuple[str, ...]] = {
+    ("shire", True): ("{} (a whisper follows you)",),
+    ("moria", True): ("{}", "(echo) {}", "(echo) a whisper in the dark..."),
+    ("mordor", True): ("[EYE] {}",),
+    ("rivendell", True): ("«{}»", "«…and the Ring feels heavy.»"),
+    ("moria", False): ("{}", "(echo) {}"),
+    ("mordor", False): ("[MORDOR] {}",),
+    ("rivendell", False): ("«{}»",),
+}
+
+PALANTIR_FORMS: Dict[str, str] = {
+    "mordor": "Palantír burns: {}",
+    "moria": "Palantír echoes: {}",
+    "shire": "Palantír gently shows: {}",
+}
+
+VISION_FORMS: Dict[str, str] = {
+    "elf": "Elf-sight sees beyond {}",
+    "dwarf": "Dwarf-sight measures exactly {}",
+    "hobbit": "Hobbit-sight notices small things within {}",
+    "wizard": "Wizard-sight pierces {}",
+}
+
+VISION_SUFFIXES: Dict[str, str] = {
+    "moria": " (in darkness)",
+    "rivendell": " (in starlight)",
+    "mordor": " (under the Eye)",
+}
+
+STAMINA_FORMS: Dict[str, str] = {
+    "hobbit": "Hobbit endurance holds for {} miles",
+    "dwarf": "Dwarf stamina digs through {} days",
+    "elf": "Elf stamina runs for {} leagues",
+    "wizard": "Wizard stamina endures for {} ages",
+}
+
+CRAFT_FORMS: Dict[str, str] = {
+    "dwarf": "Dwarven craft forges: {}",
+    "elf": "Elven craft weaves: {}",
+    "hobbit": "Hobbit craft bakes: {}",
+    "wizard": "Wizard craft inscribes: {}",
+}
+
+RACE_POWER: Dict[str, int] = {"wizard": 3, "elf": 2, "dwarf": 1, "hobbit": 1}
+
+POWER_SUFFIXES: Dict[str, str] = {
+    "shire": " (quiet strength)",
+    "rivendell": " (ancient grace)",
+    "moria": " (echoing halls)",
+}
+
 # -------------------------
 # Interpreter
 # -------------------------
 class Interpreter:
     def __init__(self):
-        self.global_env = Env()
+        # every non-parameter name lives here; spell frames are plain slot lists
+        self.globals: Dict[str, Any] = {}
         self.spells: Dict[str, Spell] = {}
+        # purity assumes the built-in collection helpers; a user spell that
+        # shadows one of them turns memoization off for the session
+        self._memo_enabled: bool = True
 
         # context
         self._region_stack: List[str] = ["wilds"]
+        # top of _region_stack, kept in step with it so the built-ins and
+        # proclaim read one attribute
+        self._region: str = "wilds"
         self._race: str = "man"
 
         # artifacts
@@ -110,25 +150,30 @@ class Interpreter:
         self._ring_destroyed: bool = False
 
         self._sync_context_globals()
-        self.global_env.set_local("ONE_RING", "One Ring")
-        self.global_env.set_local("MELLON", "mellon")
+        self.globals["ONE_RING"] = "One Ring"
+        self.globals["MELLON"] = "mellon"
 
     # -------------------------
     # Context
     # -------------------------
     def current_region(self) -> str:
-        return self._region_stack[-1] if self._region_stack else "wilds"
+        return self._region
 
     def current_race(self) -> str:
         return self._race
 
     def push_region(self, region: str) -> None:
+        # names loaded from the pickle cache are not interned; interning here
+        # keeps the flavour table lookups on the identity fast path
+        region = sys.intern(region)
         self._region_stack.append(region)
+        self._region = region
         self._sync_context_globals()
 
     def pop_region(self) -> None:
         if len(self._region_stack) > 1:
             self._region_stack.pop()
+            self._region = self._region_stack[-1]
         self._sync_context_globals()
 
     def set_race(self, race: str) -> None:
@@ -136,14 +181,18 @@ class Interpreter:
         self._sync_context_globals()
 
     def _sync_context_globals(self) -> None:
+        # Runs on every region enter/exit, so it stays a handful of plain dict
+        # stores. All five are rewritten each time: they are ordinary globals a
+        # program may assign, and any context change resets them.
+        g = self.globals
         # context globals
-        self.global_env.set_local("REGION", self.current_region())
-        self.global_env.set_local("RACE", self.current_race())
+        g["REGION"] = self._region
+        g["RACE"] = self._race
 
         # artifact globals
-        self.global_env.set_local("HAS_RING", bool(self._owned.get("ring", False)))
-        self.global_env.set_local("BEARING_RING", bool(self._bearing_ring))
-        self.global_env.set_local("RING_DESTROYED", bool(self._ring_destroyed))
+        g["HAS_RING"] = bool(self._owned.get("ring", False))
+        g["BEARING_RING"] = bool(self._bearing_ring)
+        g["RING_DESTROYED"] = bool(self._ring_destroyed)
 
     # -------------------------
     # Output flavor (regions + Ring)
@@ -151,109 +200,34 @@ class Interpreter:
     def _region_print(self, val: Any) -> None:
         if isinstance(val, float) and val.is_integer():
             val = int(val)
-
-        region = self.current_region()
-
-        # Ring influence
-        if self._bearing_ring and not self._ring_destroyed:
-            if region == "shire":
-                print(f"{val} (a whisper follows you)")
-                return
-            if region == "moria":
-                print(val)
-                print(f"(echo) {val}")
-                print("(echo) a whisper in the dark...")
-                return
-            if region == "mordor":
-                print(f"[EYE] {val}")
-                return
-            if region == "rivendell":
-                print(f"«{val}»")
-                print("«…and the Ring feels heavy.»")
-                return
-
-        # normal region behavior
-        if region == "shire":
-            print(val)
-            return
-        if region == "moria":
+        forms = PROCLAIM_FORMS.get((self._region, self._bearing_ring and not self._ring_destroyed))
+        if forms is None:
             print(val)
-            print(f"(echo) {val}")
-            return
-        if region == "mordor":
-            print(f"[MORDOR] {val}")
-            return
-        if region == "rivendell":
-            print(f"«{val}»")
             return
-
-        print(val)
+        for form in forms:
+            print(form.format(val))
 
     # -------------------------
     # LOTR built-ins (region/race/artifact aware)
     # -------------------------
     def _palantir(self, x: Any) -> str:
-        region = self.current_region()
-        if region == "mordor":
-            return f"Palantír burns: {x}"
-        if region == "moria":
-            return f"Palantír echoes: {x}"
-        if region == "shire":
-            return f"Palantír gently shows: {x}"
-        return f"Palantír shows: {x}"
+        return PALANTIR_FORMS.get(self._region, "Palantír shows: {}").format(x)
 
     def _vision(self, x: Any) -> str:
-        race = self.current_race()
-        region = self.current_region()
-
-        if race == "elf":
-            msg = f"Elf-sight sees beyond {x}"
-        elif race == "dwarf":
-            msg = f"Dwarf-sight measures exactly {x}"
-        elif race == "hobbit":
-            msg = f"Hobbit-sight notices small things within {x}"
-        elif race == "wizard":
-            msg = f"Wizard-sight pierces {x}"
-        else:
-            msg = f"Man-sight sees {x}"
-
-        if region == "moria":
-            msg += " (in darkness)"
-        elif region == "rivendell":
-            msg += " (in starlight)"
-        elif region == "mordor":
-            msg += " (under the Eye)"
-
+        msg = VISION_FORMS.get(self._race, "Man-sight sees {}").format(x)
+        msg += VISION_SUFFIXES.get(self._region, "")
         if self._bearing_ring and not self._ring_destroyed:
             msg += " (and the Ring calls to you)"
         return msg
 
     def _stamina(self, x: Any) -> str:
-        race = self.current_race()
-        if race == "hobbit":
-            return f"Hobbit endurance holds for {x} miles"
-        if race == "dwarf":
-            return f"Dwarf stamina digs through {x} days"
-        if race == "elf":
-            return f"Elf stamina runs for {x} leagues"
-        if race == "wizard":
-            return f"Wizard stamina endures for {x} ages"
-        return f"Stamina lasts {x}"
+        return STAMINA_FORMS.get(self._race, "Stamina lasts {}").format(x)
 
     def _craft(self, x: Any) -> str:
-        race = self.current_race()
-        if race == "dwarf":
-            return f"Dwarven craft forges: {x}"
-        if race == "elf":
-            return f"Elven craft weaves: {x}"
-        if race == "hobbit":
-            return f"Hobbit craft bakes: {x}"
-        if race == "wizard":
-            return f"Wizard craft inscribes: {x}"
-        return f"Craft makes: {x}"
+        return CRAFT_FORMS.get(self._race, "Craft makes: {}").format(x)
 
     def _spellcraft(self) -> str:
-        race = self.current_race()
+        race = self._race
         if race != "wizard":
             return "No spellcraft granted."
         if self._bearing_ring and not self._ring_destroyed:
@@ -273,18 +247,10 @@ class Interpreter:
         return "Inventory: " + ", ".join(sorted(set(items + extra)))
 
     def _power(self) -> str:
-        region = self.current_region()
-        race = self.current_race()
-
-        base = 1
-        if race == "wizard":
-            base += 3
-        elif race == "elf":
-            base += 2
-        elif race == "dwarf":
-            base += 1
-        elif race == "hobbit":
-            base += 1
+        region = self._region
+        race = self._race
+
+        base = 1 + RACE_POWER.get(race, 0)
 
         if self._owned.get("mithril", False):
             base += 1
@@ -295,13 +261,7 @@ class Interpreter:
 
         if region == "mordor" and self._bearing_ring and not self._ring_destroyed:
             return f"Power: {base} (the Eye turns toward you)"
-        if region == "shire":
-            return f"Power: {base} (quiet strength)"
-        if region == "rivendell":
-            return f"Power: {base} (ancient grace)"
-        if region == "moria":
-            return f"Power: {base} (echoing halls)"
-        return f"Power: {base}"
+        return f"Power: {base}{POWER_SUFFIXES.get(region, '')}"
 
     def _corruption(self) -> str:
         c = 0
@@ -309,11 +269,11 @@ class Interpreter:
             c += 2
         if self._bearing_ring and not self._ring_destroyed:
             c += 6
-        if self.current_region() == "mordor":
+        if self._region == "mordor":
             c += 2
-        if self.current_race() == "hobbit":
+        if self._race == "hobbit":
             c -= 1
-        if self.current_race() == "wizard":
+        if self._race == "wizard":
             c += 1
         if self._owned.get("phial", False):
             c -= 1
@@ -325,13 +285,12 @@ class Interpreter:
     # Artifact actions
     # -------------------------
     def _normalize_artifact(self, name: str) -> str:
-        return name.strip().lower()
+        return sys.intern(name.strip().lower())
 
     def do_artifact_action(self, action: str, artifact_raw: str) -> None:
         artifact = self._normalize_artifact(artifact_raw)
-        allowed = {"ring", "mithril", "phial"}
-        if artifact not in allowed:
-            raise RuntimeError(f"Unknown artifact: {artifact_raw}. Allowed: {', '.join(sorted(allowed))}")
+        if artifact not in ARTIFACTS:
+            raise RuntimeError(f"Unknown artifact: {artifact_raw}. Allowed: {', '.join(sorted(ARTIFACTS))}")
 
         if action == "CLAIM":
             if artifact == "ring" and self._ring_destroyed:
@@ -413,315 +372,469 @@ class Interpreter:
         return list(m.values())
 
     # -------------------------
-    # Expr evaluation
+    # Statements with runtime rules
     # -------------------------
-    def eval_expr(self, env: Env, e: Expr) -> Any:
-        if isinstance(e, Num):
-            return e.value
-        if isinstance(e, Str):
-            return e.value
-        if isinstance(e, BoolLit):
-            return e.value
-        if isinstance(e, NilLit):
-            return None
-        if isinstance(e, Var):
-            return env.get(e.name)
-
-        if isinstance(e, ListLit):
-            return [self.eval_expr(env, it) for it in e.items]
-
-        if isinstance(e, DictLit):
-            out: Dict[Any, Any] = {}
-            for k_expr, v_expr in e.items:
-                k = self.eval_expr(env, k_expr)
-                v = self.eval_expr(env, v_expr)
-                out[k] = v
-            return out
-
-        if isinstance(e, Index):
-            target = self.eval_expr(env, e.target)
-            idx = self.eval_expr(env, e.index)
-
-            if isinstance(target, dict):
-                return target.get(idx)
-
-            if isinstance(target, list):
-                if not isinstance(idx, int):
-                    raise RuntimeError("List index must be an integer")
-                if idx < 0 or idx >= len(target):
-                    raise RuntimeError("List index out of range")
-                return target[idx]
-
-            if isinstance(target, str):
-                if not isinstance(idx, int):
-                    raise RuntimeError("String index must be an integer")
-                if idx < 0 or idx >= len(target):
-                    raise RuntimeError("String index out of range")
-                return target[idx]
-
-            raise RuntimeError(f"Indexing not supported for {type(target).__name__}")
-
-        if isinstance(e, UnaryOp):
-            v = self.eval_expr(env, e.expr)
-            if e.op == "NEG":
-                if not is_number(v):
-                    raise RuntimeError(f"Unary '-' expects number, got {type(v).__name__}")
-                return -v
-            raise RuntimeError(f"Unknown unary op: {e.op}")
-
-        if isinstance(e, BinOp):
-            l = self.eval_expr(env, e.left)
-            r = self.eval_expr(env, e.right)
-            op = e.op
-
-            if op == "PLUS":
-                if isinstance(l, str) or isinstance(r, str):
-                    return str(l) + str(r)
-                if is_number(l) and is_number(r):
-                    return l + r
-                if isinstance(l, list) and isinstance(r, list):
-                    return l + r
-                raise RuntimeError("Operator '+' expects numbers or strings (or list + list)")
-
-            if op == "MINUS":
-                if is_number(l) and is_number(r):
-                    return l - r
-                raise RuntimeError("Operator '-' expects numbers")
-
-            if op == "STAR":
-                if is_number(l) and is_number(r):
-                    return l * r
-                raise RuntimeError("Operator '*' expects numbers")
-
-            if op == "SLASH":
-                if is_number(l) and is_number(r):
-                    if r == 0:
-                        raise RuntimeError("Division by zero")
-                    return l / r
-                raise RuntimeError("Operator '/' expects numbers")
-
-            if op in ("LT", "GT", "LE", "GE"):
-                if not (is_number(l) and is_number(r)):
-                    raise RuntimeError("Comparison expects numbers")
-                if op == "LT":
-                    return l < r
-                if op == "GT":
-                    return l > r
-                if op == "LE":
-                    return l <= r
-                if op == "GE":
-                    return l >= r
-
-            if op == "EQEQ":
-                return l == r
-            if op == "NE":
-                return l != r
-
-            raise RuntimeError(f"Unknown binary op: {op}")
-
-        if isinstance(e, Invoke):
-            # lore rule: in Mordor + bearing Ring, invoke forbidden
-            # FIX: remove the extra "The spell backfires:" prefix to avoid duplication in CLI output
-            if self.current_region() == "mordor" and self._bearing_ring and not self._ring_destroyed:
-                raise RuntimeError('In Mordor, while bearing the Ring, "invoke" is forbidden.')
-
-            fn = SAFE_INVOKE.get(e.target)
-            if not fn:
-                raise RuntimeError(
-                    f"Forbidden spell: {e.target}. Use one of: {', '.join(sorted(SAFE_INVOKE.keys()))}"
-                )
-            args = [self.eval_expr(env, a) for a in e.args]
-            try:
-                return fn(*args)
-            except Exception as ex:
-                raise RuntimeError(f"Invoke failed: {e.target}: {ex}") from ex
-
-        if isinstance(e, Call):
-            # user spells
-            if e.name in self.spells:
-                spell = self.spells[e.name]
-                if len(e.args) != len(spell.params):
-                    raise RuntimeError(f"Spell '{e.name}' expects {len(spell.params)} args, got {len(e.args)}")
-                call_env = Env(parent=self.global_env)
-                for p, a in zip(spell.params, e.args):
-                    call_env.set_local(p, self.eval_expr(env, a))
+    def be_race(self, race_raw: str) -> None:
+        race = race_raw.lower()
+        if race not in RACES:
+            raise RuntimeError(f"Unknown race: {race_raw}. Allowed: {', '.join(sorted(RACES))}")
+        # lower() returns a fresh string; the interned one makes every later
+        # comparison against a race literal an identity hit
+        self.set_race(sys.intern(race))
+
+    def _restore_regions(self, depth: int) -> None:
+        # unwind regions left open by a return or an error inside `in ... do`
+        if len(self._region_stack) > depth:
+            del self._region_stack[depth:]
+            self._region = self._region_stack[-1]
+            self._sync_context_globals()
+
+    def bind_python(self, src: str, consts: List[Any]) -> Callable[..., Any]:
+        # see codegen.BINDINGS for the order
+        return load_factory(src)(
+            self.globals, consts, self.spells, self.call, self._region_print, self.index,
+            self.invoke, self.check_invoke, self.be_race, self.do_artifact_action,
+            self.push_region, self.pop_region, self.bind_call, self.call_bound,
+        )
+
+    def define_spell(self, code: Code) -> None:
+        if code.name in PURE_BUILTINS:
+            self._memo_enabled = False
+        if code.name in self.spells:
+            # redefinition (e.g. in the REPL): drop every cached result
+            for sp in self.spells.values():
+                if sp.memo:
+                    sp.memo.clear()
+        fn = self.bind_python(code.pysrc, code.consts) if code.pysrc is not None else None
+        self.spells[code.name] = Spell(params=code.params, code=code, memo={} if code.pure else None, fn=fn)
+
+    # -------------------------
+    # Indexing
+    # -------------------------
+    def index(self, target: Any, idx: Any) -> Any:
+        if isinstance(target, dict):
+            return target.get(idx)
+
+        # negative indices are not part of the language; the upper bound is
+        # left to the native subscript, which checks it anyway
+        if isinstance(target, list):
+            if not isinstance(idx, int):
+                raise RuntimeError("List index must be an integer")
+            if idx >= 0:
                 try:
-                    self.exec_block(call_env, spell.body)
-                except ReturnSignal as rs:
-                    return rs.value
-                return None
-
-            args = [self.eval_expr(env, a) for a in e.args]
-
-            # LOTR built-ins
-            if e.name == "palantir":
-                if len(args) != 1:
-                    raise RuntimeError("palantir(x) expects exactly 1 argument")
-                return self._palantir(args[0])
-
-            if e.name == "vision":
-                if len(args) != 1:
-                    raise RuntimeError("vision(x) expects exactly 1 argument")
-                return self._vision(args[0])
-
-            if e.name == "stamina":
-                if len(args) != 1:
-                    raise RuntimeError("stamina(x) expects exactly 1 argument")
-                return self._stamina(args[0])
-
-            if e.name == "craft":
-                if len(args) != 1:
-                    raise RuntimeError("craft(x) expects exactly 1 argument")
-                return self._craft(args[0])
-
-            if e.name == "spellcraft":
-                if len(args) != 0:
-                    raise RuntimeError("spellcraft() expects 0 arguments")
-                return self._spellcraft()
-
-            # artifacts built-ins
-            if e.name == "inventory":
-                if len(args) != 0:
-                    raise RuntimeError("inventory() expects 0 arguments")
-                return self._inventory()
-
-            if e.name == "power":
-                if len(args) != 0:
-                    raise RuntimeError("power() expects 0 arguments")
-                return self._power()
-
-            if e.name == "corruption":
-                if len(args) != 0:
-                    raise RuntimeError("corruption() expects 0 arguments")
-                return self._corruption()
-
-            # python-like built-ins
-            if e.name == "length":
-                if len(args) != 1:
-                    raise RuntimeError("length(x) expects 1 argument")
-                return self._length(args[0])
-
-            if e.name == "push":
-                if len(args) != 2:
-                    raise RuntimeError("push(list, item) expects 2 arguments")
-                return self._push(args[0], args[1])
-
-            if e.name == "pop":
-                if len(args) != 1:
-                    raise RuntimeError("pop(list) expects 1 argument")
-                return self._pop(args[0])
-
-            if e.name == "get":
-                if len(args) != 2:
-                    raise RuntimeError("get(map, key) expects 2 arguments")
-                return self._get(args[0], args[1])
-
-            if e.name == "put":
-                if len(args) != 3:
-                    raise RuntimeError("put(map, key, value) expects 3 arguments")
-                return self._put(args[0], args[1], args[2])
-
-            if e.name == "has":
-                if len(args) != 2:
-                    raise RuntimeError("has(map, key) expects 2 arguments")
-                return self._has(args[0], args[1])
-
-            if e.name == "keys":
-                if len(args) != 1:
-                    raise RuntimeError("keys(map) expects 1 argument")
-                return self._keys(args[0])
-
-            if e.name == "values":
-                if len(args) != 1:
-                    raise RuntimeError("values(map) expects 1 argument")
-                return self._values(args[0])
-
-            # base built-ins (ring/mellon/gandalf etc)
-            if e.name in BUILTINS_BASE:
-                fn = BUILTINS_BASE[e.name]
+                    return target[idx]
+                except IndexError:
+                    pass
+            raise RuntimeError("List index out of range")
+
+        if isinstance(target, str):
+            if not isinstance(idx, int):
+                raise RuntimeError("String index must be an integer")
+            if idx >= 0:
                 try:
-                    return fn(*args)
-                except TypeError as te:
-                    raise RuntimeError(f"Builtin '{e.name}' called with wrong arguments: {te}") from te
-                except Exception as ex:
-                    raise RuntimeError(f"Builtin '{e.name}' failed: {ex}") from ex
-
-            raise RuntimeError(f"Unknown spell: {e.name}")
+                    return target[idx]
+                except IndexError:
+                    pass
+            raise RuntimeError("String index out of range")
 
-        raise RuntimeError(f"Unknown expression type: {type(e).__name__}")
+        raise RuntimeError(f"Indexing not supported for {type(target).__name__}")
 
     # -------------------------
-    # Statements
+    # Calls
     # -------------------------
-    def exec_stmt(self, env: Env, s: Stmt) -> None:
-        if isinstance(s, Inscribe):
-            val = self.eval_expr(env, s.expr)
-            env.set(s.name, val)
-            return
-
-        if isinstance(s, Proclaim):
-            val = self.eval_expr(env, s.expr)
-            self._region_print(val)
-            return
-
-        if isinstance(s, ExprStmt):
-            _ = self.eval_expr(env, s.expr)
-            return
-
-        if isinstance(s, BeRace):
-            allowed = {"man", "elf", "dwarf", "hobbit", "wizard", "orc"}
-            race = s.race.lower()
-            if race not in allowed:
-                raise RuntimeError(f"Unknown race: {s.race}. Allowed: {', '.join(sorted(allowed))}")
-            self.set_race(race)
-            return
-
-        if isinstance(s, InRegion):
-            self.push_region(s.region)
+    def check_invoke(self) -> None:
+        # runs before the arguments are evaluated, as in the tree-walker
+        # lore rule: in Mordor + bearing Ring, invoke forbidden
+        # FIX: remove the extra "The spell backfires:" prefix to avoid duplication in CLI output
+        if self._region == "mordor" and self._bearing_ring and not self._ring_destroyed:
+            raise RuntimeError('In Mordor, while bearing the Ring, "invoke" is forbidden.')
+
+    def invoke(self, bound: Tuple[str, Callable[..., Any]], args: List[Any]) -> Any:
+        # bound is the (target, fn) constant the compiler resolved; the caller
+        # has run check_invoke() before evaluating args
+        target, fn = bound
+        try:
+            return fn(*args)
+        except Exception as ex:
+            raise RuntimeError(f"Invoke failed: {target}: {ex}") from ex
+
+    def bind_call(self, name: str, argc: int) -> Optional[Spell]:
+        # Resolve a call before its arguments run, as the tree-walker did: the
+        # spell the name means now (None for a built-in), arity-checked. An
+        # argument that redefines the spell does not change the callee.
+        spell = self.spells.get(name)
+        if spell is not None and argc != len(spell.params):
+            raise RuntimeError(f"Spell '{name}' expects {len(spell.params)} args, got {argc}")
+        return spell
+
+    def call_bound(self, spell: Optional[Spell], name: str, args: List[Any]) -> Any:
+        return self.call(name, args, spell)
+
+    def call(self, name: str, args: List[Any], spell: Any = _UNBOUND) -> Any:
+        # user spells
+        if spell is _UNBOUND:
+            spell = self.spells.get(name)
+        if spell is not None:
+            if len(args) != len(spell.params):
+                raise RuntimeError(f"Spell '{name}' expects {len(spell.params)} args, got {len(args)}")
+            memo = spell.memo
+            if memo is None or not self._memo_enabled:
+                # args are already laid out in parameter order, i.e. by slot
+                if spell.fn is not None:
+                    return spell.fn(*args)
+                return self.run_code(spell.code, args)
+
+            # key on the argument types too, so f(1), f(1.0) and f(true) differ
             try:
-                self.exec_block(env, s.body)
-            finally:
-                self.pop_region()
-            return
-
-        if isinstance(s, ArtifactAction):
-            self.do_artifact_action(s.action, s.artifact)
-            return
-
-        if isinstance(s, IfStmt):
-            if truthy(self.eval_expr(env, s.cond)):
-                self.exec_block(env, s.then_body)
+                key: Any = (*args, *map(type, args))
+                hit = memo.get(key, _MISS)
+            except TypeError:
+                # list/dict argument: not hashable, and may be mutated anyway
+                key = None
+                hit = _MISS
+            if hit is not _MISS:
+                return hit
+            if spell.fn is not None:
+                result = spell.fn(*args)
             else:
-                self.exec_block(env, s.else_body)
-            return
-
-        if isinstance(s, WhileStmt):
-            while truthy(self.eval_expr(env, s.cond)):
-                self.exec_block(env, s.body)
-            return
-
-        if isinstance(s, SpellDef):
-            self.spells[s.name] = Spell(params=s.params, body=s.body)
-            return
-
-        if isinstance(s, ReturnStmt):
-            val = self.eval_expr(env, s.expr) if s.expr is not None else None
-            raise ReturnSignal(val)
+                result = self.run_code(spell.code, args)
+            if key is not None and type(result) in MEMO_RESULT_TYPES and len(memo) < MEMO_LIMIT:
+                memo[key] = result
+            return result
+
+        return self.call_builtin(name, args)
+
+    def call_builtin(self, name: str, args: List[Any]) -> Any:
+        # every built-in, whatever its kind: one dict lookup
+        entry = _BUILTINS.get(name)
+        if entry is None:
+            raise RuntimeError(f"Unknown spell: {name}")
+        fn, arity, usage = entry
+        if arity is not None:
+            if len(args) != arity:
+                raise RuntimeError(usage)
+            return fn(self, *args)
+
+        # base built-ins (ring/mellon/gandalf etc)
+        try:
+            return fn(*args)
+        except TypeError as te:
+            raise RuntimeError(f"Builtin '{name}' called with wrong arguments: {te}") from te
+        except Exception as ex:
+            raise RuntimeError(f"Builtin '{name}' failed: {ex}") from ex
 
-        raise RuntimeError(f"Unknown statement type: {type(s).__name__}")
+    # -------------------------
+    # Bytecode VM
+    # -------------------------
+    def run_code(self, co: Code, slots: List[Any]) -> Any:
+        code = co.code
+        consts = co.consts
+        names = co.names
+        globals_ = self.globals
+        stack: List[Any] = []
+        push = stack.append
+        pop = stack.pop
+        n = len(code)
+        pc = 0
+        region_depth = len(self._region_stack)
 
-    def exec_block(self, env: Env, body: List[Stmt]) -> None:
-        for st in body:
-            self.exec_stmt(env, st)
+        try:
+            while pc < n:
+                op = code[pc]
+
+                if op == LOAD_FAST:
+                    push(slots[code[pc + 1]])
+                    pc += 2
+                elif op == LOAD_GLOBAL:
+                    value = globals_.get(names[code[pc + 1]], _MISS)
+                    if value is _MISS:
+                        raise RuntimeError(f"Unknown name: {names[code[pc + 1]]}")
+                    push(value)
+                    pc += 2
+                elif op == LOAD_CONST:
+                    push(consts[code[pc + 1]])
+                    pc += 2
+                elif op == STORE_FAST:
+                    slots[code[pc + 1]] = pop()
+                    pc += 2
+                elif op == STORE_GLOBAL:
+                    globals_[names[code[pc + 1]]] = pop()
+                    pc += 2
+                elif op == JUMP_IF_FALSE:
+                    # language truthiness is Python's
+                    if pop():
+                        pc += 2
+                    else:
+                        pc = code[pc + 1]
+                elif op == JUMP:
+                    pc = code[pc + 1]
+
+                elif op == BINARY_ADD_NUM:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if (tl is int or tl is float) and (tr is int or tr is float):
+                        stack[-1] = l + r
+                        pc += 1
+                    else:
+                        # guard failed: fall back to the generic form
+                        push(r)
+                        code[pc] = BINARY_ADD
+                elif op == BINARY_ADD_STR:
+                    r = pop()
+                    l = stack[-1]
+                    if type(l) is str or type(r) is str:
+                        stack[-1] = str(l) + str(r)
+                        pc += 1
+                    else:
+                        push(r)
+                        code[pc] = BINARY_ADD
+                elif op == BINARY_CONCAT:
+                    r = pop()
+                    stack[-1] = str(stack[-1]) + str(r)
+                    pc += 1
+                elif op == BINARY_ADD:
+                    r = pop()
+                    l = pop()
+                    if isinstance(l, str) or isinstance(r, str):
+                        push(str(l) + str(r))
+                        code[pc] = BINARY_ADD_STR
+                    elif (type(l) is int or type(l) is float) and (type(r) is int or type(r) is float):
+                        push(l + r)
+                        code[pc] = BINARY_ADD_NUM
+                    elif isinstance(l, list) and isinstance(r, list):
+                        push(l + r)
+                    else:
+                        raise RuntimeError("Operator '+' expects numbers or strings (or list + list)")
+                    pc += 1
+                elif op == BINARY_SUB:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Operator '-' expects numbers")
+                    stack[-1] = l - r
+                    pc += 1
+                elif op == BINARY_MUL:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Operator '*' expects numbers")
+                    stack[-1] = l * r
+                    pc += 1
+                elif op == BINARY_DIV:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Operator '/' expects numbers")
+                    if r == 0:
+                        raise RuntimeError("Division by zero")
+                    stack[-1] = l / r
+                    pc += 1
+                elif op == COMPARE_LT:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Comparison expects numbers")
+                    stack[-1] = l < r
+                    pc += 1
+                elif op == COMPARE_GT:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Comparison expects numbers")
+                    stack[-1] = l > r
+                    pc += 1
+                elif op == COMPARE_LE:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Comparison expects numbers")
+                    stack[-1] = l <= r
+                    pc += 1
+                elif op == COMPARE_GE:
+                    r = pop()
+                    l = stack[-1]
+                    tl = type(l)
+                    tr = type(r)
+                    if not ((tl is int or tl is float) and (tr is int or tr is float)):
+                        raise RuntimeError("Comparison expects numbers")
+                    stack[-1] = l >= r
+                    pc += 1
+                elif op == COMPARE_EQ:
+                    r = pop()
+                    push(pop() == r)
+                    pc += 1
+                elif op == COMPARE_NE:
+                    r = pop()
+                    push(pop() != r)
+                    pc += 1
+                elif op == UNARY_NEG:
+                    v = stack[-1]
+                    tv = type(v)
+                    if not (tv is int or tv is float):
+                        raise RuntimeError(f"Unary '-' expects number, got {tv.__name__}")
+                    stack[-1] = -v
+                    pc += 1
+
+                elif op == CALL:
+                    argc = code[pc + 2]
+                    if argc:
+                        args = stack[-argc:]
+                        del stack[-argc:]
+                    else:
+                        args = []
+                    push(self.call(names[code[pc + 1]], args))
+                    pc += 3
+                elif op == RETURN:
+                    value = pop()
+                    if co.name == "<program>":
+                        raise RuntimeError("'return' is only allowed inside a spell")
+                    self._restore_regions(region_depth)
+                    return value
+                elif op == POP_TOP:
+                    pop()
+                    pc += 1
+                elif op == PROCLAIM:
+                    self._region_print(pop())
+                    pc += 1
+                elif op == INDEX:
+                    idx = pop()
+                    push(self.index(pop(), idx))
+                    pc += 1
+                elif op == INVOKE1:
+                    target, fn = consts[code[pc + 1]]
+                    try:
+                        stack[-1] = fn(stack[-1])
+                    except Exception as ex:
+                        raise RuntimeError(f"Invoke failed: {target}: {ex}") from ex
+                    pc += 2
+                elif op == INVOKE:
+                    target, fn = consts[code[pc + 1]]
+                    argc = code[pc + 2]
+                    if argc:
+                        args = stack[-argc:]
+                        del stack[-argc:]
+                    else:
+                        args = []
+                    try:
+                        push(fn(*args))
+                    except Exception as ex:
+                        raise RuntimeError(f"Invoke failed: {target}: {ex}") from ex
+                    pc += 3
+                elif op == CHECK_INVOKE:
+                    self.check_invoke()
+                    pc += 1
+                elif op == BIND_CALL:
+                    push(self.bind_call(names[code[pc + 1]], code[pc + 2]))
+                    pc += 3
+                elif op == CALL_BOUND:
+                    argc = code[pc + 2]
+                    if argc:
+                        args = stack[-argc:]
+                        del stack[-argc:]
+                    else:
+                        args = []
+                    stack[-1] = self.call(names[code[pc + 1]], args, stack[-1])
+                    pc += 3
+                elif op == BUILD_LIST:
+                    count = code[pc + 1]
+                    if count:
+                        items = stack[-count:]
+                        del stack[-count:]
+                    else:
+                        items = []
+                    push(items)
+                    pc += 2
+                elif op == BUILD_DICT:
+                    count = 2 * code[pc + 1]
+                    out: Dict[Any, Any] = {}
+                    if count:
+                        flat = stack[-count:]
+                        del stack[-count:]
+                        for i in range(0, count, 2):
+                            out[flat[i]] = flat[i + 1]
+                    push(out)
+                    pc += 2
+
+                elif op == PUSH_REGION:
+                    self.push_region(consts[code[pc + 1]])
+                    pc += 2
+                elif op == POP_REGION:
+                    self.pop_region()
+                    pc += 1
+                elif op == SET_RACE:
+                    self.be_race(consts[code[pc + 1]])
+                    pc += 2
+                elif op == ARTIFACT:
+                    self.do_artifact_action(consts[code[pc + 1]], consts[code[pc + 2]])
+                    pc += 3
+                elif op == RUN_PYTHON:
+                    self.bind_python(consts[code[pc + 1]], consts)()
+                    pc += 2
+                elif op == DEF_SPELL:
+                    self.define_spell(consts[code[pc + 1]])
+                    pc += 2
+                else:
+                    raise RuntimeError(f"Unknown opcode: {op}")
+        except BaseException:
+            self._restore_regions(region_depth)
+            raise
+        return None
+
+    def run_program(self, co: Code) -> None:
+        # Statements never recurse in Python (blocks are jumps in flat code);
+        # only spell calls do, so running out of stack means runaway recursion.
+        try:
+            self.run_code(co, [])
+        except RecursionError:
+            raise RuntimeError("Spells nested too deeply (runaway recursion?)") from None
 
     def run(self, src: str) -> None:
-        tokens = tokenize(src)
-        program = Parser(tokens).parse_program()
-        self.exec_block(self.global_env, program)
+        self.run_program(compile_source(src))
+
+# name -> (method, arity, message when called with any other arity). An arity
+# of None marks a plain function from BUILTINS_BASE, called without the
+# interpreter and left to Python to check its arguments.
+_BUILTINS: Dict[str, Tuple[Callable[..., Any], Optional[int], str]] = {
+    **{name: (fn, None, "") for name, fn in BUILTINS_BASE.items()},
+    # LOTR built-ins
+    "palantir": (Interpreter._palantir, 1, "palantir(x) expects exactly 1 argument"),
+    "vision": (Interpreter._vision, 1, "vision(x) expects exactly 1 argument"),
+    "stamina": (Interpreter._stamina, 1, "stamina(x) expects exactly 1 argument"),
+    "craft": (Interpreter._craft, 1, "craft(x) expects exactly 1 argument"),
+    "spellcraft": (Interpreter._spellcraft, 0, "spellcraft() expects 0 arguments"),
+    # artifacts built-ins
+    "inventory": (Interpreter._inventory, 0, "inventory() expects 0 arguments"),
+    "power": (Interpreter._power, 0, "power() expects 0 arguments"),
+    "corruption": (Interpreter._corruption, 0, "corruption() expects 0 arguments"),
+    # python-like built-ins
+    "length": (Interpreter._length, 1, "length(x) expects 1 argument"),
+    "push": (Interpreter._push, 2, "push(list, item) expects 2 arguments"),
+    "pop": (Interpreter._pop, 1, "pop(list) expects 1 argument"),
+    "get": (Interpreter._get, 2, "get(map, key) expects 2 arguments"),
+    "put": (Interpreter._put, 3, "put(map, key, value) expects 3 arguments"),
+    "has": (Interpreter._has, 2, "has(map, key) expects 2 arguments"),
+    "keys": (Interpreter._keys, 1, "keys(map) expects 1 argument"),
+    "values": (Interpreter._values, 1, "values(map) expects 1 argument"),
+}
 
 # Convenience
 def run_source(src: str) -> None:
-    Interpreter().run(src)
+    itp = Interpreter()
+    itp.run_program(load_or_compile(src))
 
 def run_file(path: str) -> None:
     with open(path, "r", encoding="utf-8") as f:
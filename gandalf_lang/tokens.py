@@ -1,13 +1,43 @@
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, List
 
-@dataclass(frozen=True)
-class Token:
-    type: str
-    value: Any
-    line: int
-    col: int
+# Token kinds are small ints so the parser compares and dispatches on them
+# cheaply. TOKEN_NAMES[kind] is the name used in error messages and kept in the
+# AST (BinOp.op, ArtifactAction.action).
+TOKEN_NAMES = (
+    "EOF", "NEWLINE", "IDENT", "NUMBER", "STRING",
+    # keywords
+    "INSCRIBE", "PROCLAIM", "IF", "THEN", "ELSE", "WHILE", "DO", "END", "SPELL",
+    "RETURN", "INVOKE", "WITH", "IN", "BE", "CLAIM", "BEAR", "UNBEAR", "DESTROY",
+    "TRUE", "FALSE", "NIL",
+    # operators
+    "EQEQ", "NE", "LE", "GE", "PLUS", "MINUS", "STAR", "SLASH", "LPAREN", "RPAREN",
+    "LBRACK", "RBRACK", "LBRACE", "RBRACE", "LT", "GT", "EQ", "COMMA", "COLON",
+)
+TOKEN_KINDS = {name: kind for kind, name in enumerate(TOKEN_NAMES)}
+(
+    TK_EOF, TK_NEWLINE, TK_IDENT, TK_NUMBER, TK_STRING,
+    TK_INSCRIBE, TK_PROCLAIM, TK_IF, TK_THEN, TK_ELSE, TK_WHILE, TK_DO, TK_END, TK_SPELL,
+    TK_RETURN, TK_INVOKE, TK_WITH, TK_IN, TK_BE, TK_CLAIM, TK_BEAR, TK_UNBEAR, TK_DESTROY,
+    TK_TRUE, TK_FALSE, TK_NIL,
+    TK_EQEQ, TK_NE, TK_LE, TK_GE, TK_PLUS, TK_MINUS, TK_STAR, TK_SLASH, TK_LPAREN, TK_RPAREN,
+    TK_LBRACK, TK_RBRACK, TK_LBRACE, TK_RBRACE, TK_LT, TK_GT, TK_EQ, TK_COMMA, TK_COLON,
+) = range(len(TOKEN_NAMES))
+
+@dataclass
+class TokenStream:
+    # Token i is (types[i], values[i]); tokens are never built as objects, the
+    # parser reads these lists directly. Keywords and operators carry their
+    # source text as the value. types stays a list: indexing a list is much
+    # quicker than an array, and its small ints are shared objects anyway.
+    types: List[int]
+    values: List[Any]
+    # source position of token i, only read when reporting an error, so packed
+    # as C ints (a list would hold a separate int object for most of them)
+    lines: array[int]
+    cols: array[int]
 
 class GandalfError(Exception):
     """Base error for the language."""
@@ -0,0 +1,34 @@
+from __future__ import annotations
+import contextlib
+import io
+from unittest import mock
+
+from gandalf_lang.runtime import Interpreter
+from gandalf_lang.tokens import GandalfError
+
+def run(src: str, itp: Interpreter | None = None) -> str:
+    """Output of a program, with a failure reported the way the CLI does.
+    Chunks separated by a `----` line run one after another in the same
+    interpreter, like successive REPL entries."""
+    itp = itp or Interpreter()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        for chunk in src.split("\n----\n"):
+            try:
+                itp.run(chunk)
+            except GandalfError as e:
+                print(f"Fizzle: {e}")
+    return out.getvalue()
+
+@contextlib.contextmanager
+def no_codegen():
+    """Nothing compiled inside this block is generated as Python, so every
+    spell and loop runs as bytecode."""
+    with mock.patch("gandalf_lang.compiler.codegen_spell", return_value=None), \
+            mock.patch("gandalf_lang.compiler.codegen_block", return_value=None):
+        yield
+
+def run_vm(src: str) -> str:
+    """Same as run(), with everything running as bytecode."""
+    with no_codegen():
+        return run(src)
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gandalf_lang import cache
+from gandalf_lang.compiler import Code
+from gandalf_lang.runtime import Interpreter
+from tests.support import run
+
+SRC = "spell sq(x) do\nreturn x * x\nend\nproclaim sq(3)\n"
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        env = mock.patch.dict(os.environ, {"GANDALF_CACHE_DIR": self.dir.name, "GANDALF_CACHE": "1"})
+        env.start()
+        self.addCleanup(env.stop)
+        stats = mock.patch.dict(cache.stats, {"hits": 0, "misses": 0})
+        stats.start()
+        self.addCleanup(stats.stop)
+        self.path = os.path.join(self.dir.name, cache.cache_key(SRC) + ".pkl")
+
+    def test_miss_then_hit(self):
+        first = cache.load_or_compile(SRC)
+        self.assertTrue(os.path.exists(self.path))
+        second = cache.load_or_compile(SRC)
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 1})
+        self.assertEqual(second.code, first.code)
+        self.assertEqual(len(second.consts), len(first.consts))
+
+    def test_corrupt_entry_is_recompiled_and_replaced(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a pickle")
+        co = cache.load_or_compile(SRC)
+        self.assertIsInstance(co, Code)
+        self.assertEqual(cache.stats["misses"], 1)
+        cache.load_or_compile(SRC)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    def test_disabled_cache_writes_nothing(self):
+        with mock.patch.dict(os.environ, {"GANDALF_CACHE": "0"}):
+            cache.load_or_compile(SRC)
+        self.assertEqual(os.listdir(self.dir.name), [])
+        self.assertEqual(cache.stats, {"hits": 0, "misses": 0})
+
+    def test_key_depends_on_source_and_bytecode_version(self):
+        self.assertNotEqual(cache.cache_key(SRC), cache.cache_key(SRC + "\n"))
+        with mock.patch.object(cache, "BYTECODE_VERSION", -1):
+            self.assertNotEqual(cache.cache_key(SRC), os.path.basename(self.path)[:-len(".pkl")])
+
+    def test_unwritable_cache_dir_still_runs(self):
+        blocker = os.path.join(self.dir.name, "file")
+        open(blocker, "w").close()
+        with mock.patch.dict(os.environ, {"GANDALF_CACHE_DIR": os.path.join(blocker, "sub")}):
+            self.assertIsInstance(cache.load_or_compile(SRC), Code)
+
+    def test_cached_program_runs_like_a_fresh_one(self):
+        cache.load_or_compile(SRC)
+        itp = Interpreter()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            itp.run_program(cache.load_or_compile(SRC))
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(out.getvalue(), run(SRC))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from tests.support import run, run_vm
+
+SPELLS = """spell g() do
+  proclaim "g ran"
+  return 1
+end
+spell f(a, b) do
+  return a + b
+end
+"""
+
+class CallOrderTest(unittest.TestCase):
+    def assertRuns(self, src, expected):
+        self.assertEqual(run(src), expected)
+        self.assertEqual(run_vm(src), expected)
+
+    def test_spell_arity_checked_before_arguments(self):
+        self.assertRuns(SPELLS + "proclaim f(g())\n",
+                        "Fizzle: The spell backfires: Spell 'f' expects 2 args, got 1\n")
+
+    def test_spell_arity_checked_before_arguments_inside_spell(self):
+        src = SPELLS + "spell h(x) do\nproclaim f(g())\nend\nh(1)\n"
+        self.assertRuns(src, "Fizzle: The spell backfires: Spell 'f' expects 2 args, got 1\n")
+
+    def test_self_tail_call_arity_checked_before_arguments(self):
+        src = SPELLS + "spell t(n) do\nif n == 0 then\nreturn 0\nend\nreturn t(n - 1, g())\nend\nproclaim t(3)\n"
+        self.assertRuns(src, "Fizzle: The spell backfires: Spell 't' expects 1 args, got 2\n")
+
+    def test_callee_resolved_before_arguments(self):
+        # the argument redefines f; this call still goes to the old f, whose
+        # own recursive call then finds the new one
+        src = ('spell redef() do\nspell f(n) do\nreturn "new " + n\nend\nreturn 1\nend\n'
+               'spell f(n) do\nif n == 0 then\nreturn "old"\nend\n'
+               'if n == 2 then\nreturn f(redef())\nend\nreturn f(n - 1)\nend\n'
+               'proclaim f(3)\nproclaim f(5)\n')
+        self.assertRuns(src, "new 0\nnew 5\n")
+
+    def test_callee_resolved_before_arguments_outside_tail_position(self):
+        src = ('spell redef() do\nspell g(a, b) do\nreturn "new"\nend\nreturn 1\nend\n'
+               'spell g(n) do\nreturn "old " + n\nend\n'
+               'spell h() do\ninscribe r = g(redef())\nreturn r\nend\nproclaim h()\nproclaim g(1, 2)\n')
+        self.assertRuns(src, "old 1\nnew\n")
+
+    def test_builtin_arity_checked_after_arguments(self):
+        self.assertRuns(SPELLS + "proclaim length(g(), 2)\n",
+                        "g ran\nFizzle: The spell backfires: length(x) expects 1 argument\n")
+
+    def test_forbidden_invoke_runs_no_arguments(self):
+        forbidden = 'Fizzle: The spell backfires: In Mordor, while bearing the Ring, "invoke" is forbidden.\n'
+        self.assertRuns(SPELLS + 'claim ring\nbear ring\nin mordor do\nproclaim invoke "abs"(g())\nend\n',
+                        forbidden)
+        src = SPELLS + ('spell k(x) do\nin mordor do\nreturn invoke "abs"(g() - x)\nend\nend\n'
+                        'claim ring\nbear ring\nproclaim k(2)\n')
+        self.assertRuns(src, forbidden)
+
+if __name__ == "__main__":
+    unittest.main()
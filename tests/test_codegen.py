@@ -0,0 +1,37 @@
+import unittest
+
+from tests.support import run, run_vm
+
+class ChainedComparisonTest(unittest.TestCase):
+    def test_comparison_result_is_checked_in_numeric_body(self):
+        src = "spell f(a, b, c) do\nreturn a < b < c\nend\nproclaim f(1, 2, 3)\n"
+        self.assertEqual(run(src), "Fizzle: The spell backfires: Comparison expects numbers\n")
+        self.assertEqual(run(src), run_vm(src))
+
+    def test_comparison_against_literal(self):
+        src = "spell g(a, b) do\nreturn a >= b >= 0\nend\nproclaim g(2, 1)\n"
+        self.assertEqual(run(src), "Fizzle: The spell backfires: Comparison expects numbers\n")
+        self.assertEqual(run(src), run_vm(src))
+
+    def test_arithmetic_chain_stays_unchecked(self):
+        src = "spell h(a, b) do\nreturn a + b - 1 < 10\nend\nproclaim h(2, 3)\n"
+        self.assertEqual(run(src), "True\n")
+        self.assertEqual(run(src), run_vm(src))
+
+class DeepExpressionTest(unittest.TestCase):
+    # alternating operators nest BinOps past CPython's 200 parentheses
+    DEEP = "x" + " - 1 + 1" * 120
+
+    def test_deep_spell_body_falls_back_to_bytecode(self):
+        src = f"spell f(x) do\nreturn {self.DEEP}\nend\nproclaim f(1)\nproclaim f(\"a\")\n"
+        self.assertEqual(run(src), "1\nFizzle: The spell backfires: Operator '-' expects numbers\n")
+        self.assertEqual(run(src), run_vm(src))
+
+    def test_deep_loop_body_falls_back_to_bytecode(self):
+        src = (f"inscribe x = 1\ninscribe i = 0\nwhile i < 2 do\ninscribe x = {self.DEEP}\n"
+               "inscribe i = i + 1\nend\nproclaim x\n")
+        self.assertEqual(run(src), "1\n")
+        self.assertEqual(run(src), run_vm(src))
+
+if __name__ == "__main__":
+    unittest.main()
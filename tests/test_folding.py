@@ -0,0 +1,25 @@
+import unittest
+
+from gandalf_lang.compiler import compile_source
+from tests.support import run, run_vm
+
+BIG = "9" * 400
+
+class FoldingOverflowTest(unittest.TestCase):
+    def test_unreached_overflow_compiles(self):
+        for expr in (f"{BIG} / 3", f"{BIG} + 0.5", f"{BIG} * 1.5 < 1", f"{BIG} / 3 / 3"):
+            with self.subTest(expr=expr):
+                src = f"if false then\nproclaim {expr}\nend\nproclaim \"ok\"\n"
+                self.assertEqual(run(src), "ok\n")
+                self.assertEqual(run(src), run_vm(src))
+
+    def test_overflow_is_left_to_the_runtime(self):
+        compile_source(f"proclaim {BIG} / 3\n")
+        with self.assertRaises(OverflowError):
+            run(f"proclaim {BIG} / 3\n")
+
+    def test_foldable_constants_still_fold(self):
+        self.assertEqual(run("proclaim 1 + 2 * 3\nproclaim \"a\" + 1 + 2\n"), "7\na12\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import unittest
+
+from tests.support import run, run_vm
+
+# Each program under tests/programs (and each example) next to the output the
+# original tree-walking interpreter printed for it, in tests/expected. Both the
+# generated Python and the bytecode VM must reproduce it.
+#
+# Deliberate changes, whose expected file holds the new output instead:
+#   return_top, toplevel_loops   a top-level `return` is a language error, not
+#                                a leaked internal ReturnSignal (chunk0-1)
+#   invoke_forbidden             an unknown invoke target is rejected when the
+#                                program is parsed (chunk0-11)
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXPECTED = os.path.join(HERE, "expected")
+SOURCES = [os.path.join(HERE, "programs"), os.path.join(os.path.dirname(HERE), "examples")]
+
+def _programs():
+    for folder in SOURCES:
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".gandalf"):
+                yield name[:-len(".gandalf")], os.path.join(folder, name)
+
+class ProgramOutputTest(unittest.TestCase):
+    def test_programs(self):
+        for name, path in _programs():
+            with self.subTest(program=name):
+                with open(path, encoding="utf-8") as f:
+                    src = f.read()
+                with open(os.path.join(EXPECTED, name + ".out"), encoding="utf-8") as f:
+                    expected = f.read()
+                self.assertEqual(run(src), expected)
+                self.assertEqual(run_vm(src), expected)
+
+if __name__ == "__main__":
+    unittest.main()
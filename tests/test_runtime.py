@@ -0,0 +1,104 @@
+import contextlib
+import io
+import unittest
+
+from gandalf_lang.compiler import BINARY_ADD, BINARY_ADD_NUM, BINARY_ADD_STR, compile_source
+from gandalf_lang.runtime import Interpreter
+from tests.support import no_codegen, run
+
+class BothTiers:
+    """Runs each check with generated Python and again on the bytecode VM."""
+
+    def each_tier(self):
+        for vm in (False, True):
+            with self.subTest(vm=vm):
+                if vm:
+                    with no_codegen():
+                        yield Interpreter()
+                else:
+                    yield Interpreter()
+
+class MemoTest(BothTiers, unittest.TestCase):
+    def test_pure_spell_is_memoized(self):
+        for itp in self.each_tier():
+            self.assertEqual(run("spell sq(x) do\nreturn x * x\nend\nproclaim sq(4)\n", itp), "16\n")
+            self.assertEqual(len(itp.spells["sq"].memo), 1)
+
+    def test_spell_reading_a_global_is_not_memoized(self):
+        src = "inscribe k = 1\nspell f(x) do\nreturn x + k\nend\nproclaim f(1)\ninscribe k = 10\nproclaim f(1)\n"
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "2\n11\n")
+            self.assertIsNone(itp.spells["f"].memo)
+
+    def test_argument_types_are_part_of_the_key(self):
+        src = 'spell f(x) do\nreturn "" + x\nend\nproclaim f(1)\nproclaim f(1.0)\nproclaim f(true)\n'
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "1\n1.0\nTrue\n")
+
+    def test_list_results_are_not_shared(self):
+        src = "spell mk(n) do\nreturn [n]\nend\ninscribe a = mk(1)\npush(a, 2)\nproclaim mk(1)\n"
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "[1]\n")
+
+    def test_shadowed_builtin_turns_memoization_off(self):
+        src = ('spell twice(s) do\nreturn length(s) * 2\nend\nproclaim twice("abc")\n'
+               '----\nspell length(x) do\nreturn 0\nend\nproclaim twice("abc")\n')
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "6\n0\n")
+
+    def test_redefinition_drops_cached_results(self):
+        src = "spell sq(x) do\nreturn x * x\nend\nproclaim sq(4)\n----\nspell sq(x) do\nreturn x + x\nend\nproclaim sq(4)\n"
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "16\n8\n")
+
+class QuickeningTest(unittest.TestCase):
+    def run_with(self, co, itp, a, b):
+        itp.globals["a"] = a
+        itp.globals["b"] = b
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            itp.run_code(co, [])
+        return out.getvalue()
+
+    def test_add_specializes_and_falls_back(self):
+        co = compile_source("proclaim a + b\n")
+        self.assertIn(BINARY_ADD, co.code)
+        itp = Interpreter()
+        self.assertEqual(self.run_with(co, itp, 1, 2.5), "3.5\n")
+        self.assertIn(BINARY_ADD_NUM, co.code)
+        # a guard miss runs the generic form, which then respecializes
+        self.assertEqual(self.run_with(co, itp, "x", 1), "x1\n")
+        self.assertIn(BINARY_ADD_STR, co.code)
+        self.assertEqual(self.run_with(co, itp, [1], [2]), "[1, 2]\n")
+        self.assertEqual(self.run_with(co, itp, 2, 3), "5\n")
+
+class RecursionTest(BothTiers, unittest.TestCase):
+    def test_runaway_recursion_is_a_language_error(self):
+        src = "spell down(n) do\nreturn 1 + down(n + 1)\nend\nproclaim down(0)\n"
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp),
+                             "Fizzle: The spell backfires: Spells nested too deeply (runaway recursion?)\n")
+
+class RegionUnwindTest(BothTiers, unittest.TestCase):
+    def test_error_inside_region_restores_the_wilds(self):
+        src = "spell boom(x) do\nin mordor do\nin moria do\nreturn x / 0\nend\nend\nend\nproclaim boom(1)\n"
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "Fizzle: The spell backfires: Division by zero\n")
+            self.assertEqual(itp.current_region(), "wilds")
+            self.assertEqual(itp.globals["REGION"], "wilds")
+
+    def test_error_in_top_level_loop_inside_region(self):
+        src = "inscribe i = 0\nwhile i < 3 do\nin rohan do\ninscribe i = i + nil\nend\nend\n"
+        for itp in self.each_tier():
+            self.assertIn("Fizzle", run(src, itp))
+            self.assertEqual(itp.current_region(), "wilds")
+
+    def test_return_inside_nested_regions(self):
+        src = ("spell f(n) do\nin mordor do\nin rivendell do\nif n > 0 then\nreturn REGION\nend\nend\n"
+               "proclaim REGION\nend\nreturn REGION\nend\nproclaim f(1)\nproclaim f(0)\nproclaim REGION\n")
+        for itp in self.each_tier():
+            self.assertEqual(run(src, itp), "rivendell\n[MORDOR] mordor\nwilds\nwilds\n")
+            self.assertEqual(itp.current_region(), "wilds")
+
+if __name__ == "__main__":
+    unittest.main()